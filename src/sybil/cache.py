@@ -0,0 +1,562 @@
+import hashlib
+import json
+import marshal
+import os
+import pickle
+import sys
+import sysconfig
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import MAGIC_NUMBER
+from io import open
+from operator import itemgetter
+from pathlib import Path
+from re import Pattern
+from tempfile import NamedTemporaryFile
+from types import BuiltinFunctionType, CodeType, FunctionType, MethodType
+from typing import IO, Any, Dict, List, Optional, Set, Tuple, Type
+
+from .document import Document
+from .region import Region
+from .typing import Parser
+
+#: This should be incremented whenever the way regions are cached changes incompatibly.
+CACHE_FORMAT = 1
+
+SIMPLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+SYBIL_SOURCE = Path(__file__).parent
+
+_source_hashes: Dict[str, bytes] = {}
+
+
+def source_hash(filename: str) -> bytes:
+    """
+    Return a hash of the contents of the supplied source file, computing it only
+    once per process.
+    """
+    digest = _source_hashes.get(filename)
+    if digest is None:
+        try:
+            digest = hashlib.sha256(Path(filename).read_bytes()).digest()
+        except OSError:
+            digest = b''
+        _source_hashes[filename] = digest
+    return digest
+
+
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(filename: str) -> Optional[str]:
+    """
+    Return a hash of the contents of the supplied file, or ``None`` if it cannot be read.
+    Hashes are only computed again if the file's modification time or size changes.
+    """
+    try:
+        stat = os.stat(filename)
+        key = filename, stat.st_mtime_ns, stat.st_size
+        digest = _file_hashes.get(key)
+        if digest is None:
+            digest = _file_hashes[key] = hashlib.sha256(Path(filename).read_bytes()).hexdigest()
+    except OSError:
+        return None
+    return digest
+
+
+def project_module_files() -> List[str]:
+    """
+    Return the source files of modules that have been imported and are not part of the
+    standard library or installed into site-packages.
+    """
+    installed = tuple(
+        {sysconfig.get_path(name) for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')}
+    )
+    filenames = set()
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if filename and not filename.startswith(installed):
+            filenames.add(filename)
+    return sorted(filenames)
+
+
+class ParserGraph:
+    """
+    The graph of objects reachable from a sequence of :term:`parsers <parser>`.
+
+    Walking this graph produces a stable description of how the parsers are configured,
+    along with a record of the objects found. This record allows references to those
+    objects, such as the evaluators of regions, to be stored in the cache and then
+    resolved back to the equivalent objects in a later process.
+    """
+
+    def __init__(self, parsers: Sequence[Parser]) -> None:
+        self.ids: Dict[int, Tuple[Any, str]] = {}
+        self.objects: Dict[str, Any] = {}
+        self.modules: Set[str] = set()
+        self.description = self.describe(list(parsers), 'parsers')
+        self.fingerprint = self.compute_fingerprint()
+
+    def name(self, obj: Any) -> str:
+        module = getattr(obj, '__module__', None)
+        if module:
+            self.modules.add(module)
+        return f'{module}.{getattr(obj, "__qualname__", obj)}'
+
+    @staticmethod
+    def state(obj: Any) -> Dict[str, Any]:
+        """
+        Return the attributes of the supplied object, including those stored in slots.
+        """
+        state = dict(getattr(obj, '__dict__', {}))
+        for type_ in type(obj).__mro__:
+            slots = type_.__dict__.get('__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name not in ('__dict__', '__weakref__') and hasattr(obj, name):
+                    state[name] = getattr(obj, name)
+        return state
+
+    def describe(self, obj: Any, path: Optional[str]) -> str:
+        # Objects only get a path where that path will be the same in a later process:
+        if isinstance(obj, SIMPLE_TYPES):
+            return repr(obj)
+        if isinstance(obj, Pattern):
+            return f're.compile({obj.pattern!r}, {obj.flags})'
+        if isinstance(obj, (type, FunctionType, BuiltinFunctionType)):
+            return self.name(obj)
+        if isinstance(obj, MethodType):
+            self_path = None if path is None else path + '.__self__'
+            return f'{self.describe(obj.__self__, self_path)}.{obj.__name__}'
+        if isinstance(obj, (list, tuple)):
+            parts = [
+                self.describe(item, None if path is None else f'{path}[{i}]')
+                for i, item in enumerate(obj)
+            ]
+            return f'{self.name(type(obj))}[{", ".join(parts)}]'
+        if isinstance(obj, (set, frozenset)):
+            parts = sorted(self.describe(item, None) for item in obj)
+            return f'{self.name(type(obj))}{{{", ".join(parts)}}}'
+        if isinstance(obj, dict):
+            items = sorted(
+                ((self.describe(key, None), value) for key, value in obj.items()),
+                key=itemgetter(0),
+            )
+            parts = [
+                f'{key}: {self.describe(value, None if path is None else f"{path}[{key}]")}'
+                for key, value in items
+            ]
+            return f'{self.name(type(obj))}{{{", ".join(parts)}}}'
+        seen = self.ids.get(id(obj))
+        if seen is not None:
+            return f'<{seen[1]}>'
+        if path is not None:
+            self.ids[id(obj)] = (obj, path)
+            self.objects[path] = obj
+        type_ = type(obj)
+        for base in type_.__mro__:
+            self.name(base)
+        state = self.state(obj)
+        if not state:
+            return self.name(type_)
+        parts = [
+            f'{name}={self.describe(value, None if path is None else f"{path}.{name}")}'
+            for name, value in sorted(state.items())
+        ]
+        return f'{self.name(type_)}({", ".join(parts)})'
+
+    def compute_fingerprint(self) -> str:
+        """
+        Return a hash of the parser configuration, the Python version and the source of
+        every module involved in defining the parsers.
+        """
+        digest = hashlib.sha256()
+        for part in str(CACHE_FORMAT), sys.version, self.description:
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        filenames = {str(path) for path in SYBIL_SOURCE.rglob('*.py')}
+        for module_name in self.modules:
+            filename = getattr(sys.modules.get(module_name), '__file__', None)
+            if filename:
+                filenames.add(filename)
+        for filename in sorted(filenames):
+            digest.update(source_hash(filename))
+        return digest.hexdigest()
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        seen = self.ids.get(id(obj))
+        if seen is not None and seen[0] is obj:
+            return seen[1]
+        return None
+
+    def persistent_load(self, path: str) -> Any:
+        try:
+            return self.objects[path]
+        except KeyError:
+            raise pickle.UnpicklingError(f'{path} not found') from None
+
+
+class RegionPickler(pickle.Pickler):
+    def __init__(self, file: IO[bytes], graph: ParserGraph) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.graph = graph
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return self.graph.persistent_id(obj)
+
+
+class RegionUnpickler(pickle.Unpickler):
+    def __init__(self, file: IO[bytes], graph: ParserGraph) -> None:
+        super().__init__(file)
+        self.graph = graph
+
+    def persistent_load(self, pid: Any) -> Any:
+        return self.graph.persistent_load(pid)
+
+
+class ParseCache:
+    """
+    A persistent, on-disk cache of the :class:`regions <sybil.Region>` parsed from
+    documentation source files.
+
+    Entries are keyed on the text of the source file along with a fingerprint of the
+    :term:`parsers <parser>` used, so a hit means the file can be turned into a
+    :class:`~sybil.Document` without any lexing or parsing taking place.
+
+    :param path:
+        The directory in which cached regions will be stored.
+
+    :param parsers:
+        The :term:`parsers <parser>` being used to parse documents.
+
+    When several processes, such as `pytest-xdist`__ workers, miss on the same entry at the
+    same time, only one of them parses the file while the others wait for its entry to be
+    stored.
+
+    __ https://pytest-xdist.readthedocs.io
+    """
+
+    #: How long, in seconds, to wait for another process to store an entry before parsing
+    #: the file here instead.
+    lock_timeout: float = 60
+
+    #: How often, in seconds, to check whether another process has stored an entry.
+    poll_interval: float = 0.02
+
+    def __init__(self, path: Path, parsers: Sequence[Parser]) -> None:
+        self.path = path
+        self.parsers = parsers
+        # This is computed when the cache is created, and only once, so that it reflects the
+        # parsers as configured rather than any state they build up while examples are
+        # evaluated, which could otherwise change the keys of later documents:
+        self.graph = ParserGraph(parsers)
+
+    def digest(self, document_type: Type[Document], *parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in (
+            self.graph.fingerprint,
+            document_type.__module__,
+            document_type.__qualname__,
+        ) + parts:
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def key(self, document_type: Type[Document], path: str, text: str) -> str:
+        return self.digest(document_type, path, text)
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / 'regions' / f'{key}.pickle'
+
+    def load(self, key: str) -> Optional[List[Region]]:
+        try:
+            with open(self.entry_path(key), 'rb') as source:
+                regions: List[Region] = RegionUnpickler(source, self.graph).load()
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is treated as a miss and will be replaced.
+            return None
+        return regions
+
+    def store(self, key: str, regions: List[Region]) -> None:
+        path = self.entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as target:
+                try:
+                    RegionPickler(target, self.graph).dump(regions)
+                except (pickle.PicklingError, AttributeError, TypeError):
+                    # Regions involving objects that can't be pickled, such as lambdas,
+                    # are simply not cached:
+                    stored = False
+                else:
+                    stored = True
+            if stored:
+                os.replace(target.name, path)
+            else:
+                os.remove(target.name)
+        except OSError:
+            # The cache is only an optimisation, so a read-only or full disk isn't an error:
+            pass
+
+    def lock(self, key: str) -> Optional[Path]:
+        """
+        Try to claim the right to parse the file for the supplied key, returning the
+        path of the lock file if successful.
+        """
+        path = self.entry_path(key).with_suffix('.lock')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError:
+            # Either another process holds the lock or the cache can't be written to,
+            # in which case wait() will find no lock file and this process will parse:
+            return None
+        return path
+
+    def wait(self, key: str) -> Optional[List[Region]]:
+        """
+        Wait for another process holding the lock for the supplied key to store its entry,
+        returning ``None`` if it fails to do so.
+        """
+        lock_path = self.entry_path(key).with_suffix('.lock')
+        while True:
+            regions = self.load(key)
+            if regions is not None:
+                return regions
+            try:
+                locked_at = lock_path.stat().st_mtime
+            except OSError:
+                # The other process has finished, so any entry it stored is now there:
+                return self.load(key)
+            if time.time() - locked_at > self.lock_timeout:
+                return None
+            time.sleep(self.poll_interval)
+
+    def parse(self, document_type: Type[Document], path: Path, encoding: str) -> Document:
+        """
+        Return a :class:`~sybil.Document` of the supplied type for the source file
+        at the supplied path, using cached regions if they are available.
+        """
+        with open(path, encoding=encoding) as source:
+            text = source.read()
+        key = self.key(document_type, str(path), text)
+        regions = self.load(key)
+        lock_path = None
+        if regions is None:
+            lock_path = self.lock(key)
+            if lock_path is None:
+                regions = self.wait(key)
+        if regions is None:
+            try:
+                document = document_type.parse(str(path), *self.parsers, encoding=encoding)
+                self.store(
+                    self.key(document_type, str(path), document.text),
+                    [region for _, region in document.regions],
+                )
+            finally:
+                if lock_path is not None:
+                    lock_path.unlink()
+        else:
+            document = document_type(text, str(path))
+            document.regions = [(region.start, region) for region in regions]
+        return document
+
+    def store_json(self, path: Path, data: Any) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                'w', dir=path.parent, suffix='.tmp', delete=False, encoding='utf-8'
+            ) as target:
+                json.dump(data, target)
+            os.replace(target.name, path)
+        except OSError:
+            # The cache is only an optimisation, so a read-only or full disk isn't an error:
+            pass
+
+    def manifest_path(self, document_type: Type[Document], path: Path, variant: str) -> Path:
+        key = self.digest(document_type, str(path), variant)
+        return self.path / 'manifests' / f'{key}.json'
+
+    def load_manifest(
+        self, document_type: Type[Document], path: Path, variant: str
+    ) -> Optional[List[Any]]:
+        """
+        Return the entries stored by :meth:`store_manifest` for the source file at the
+        supplied path and variant, or ``None`` if there are none or the file has since
+        changed.
+        """
+        try:
+            stat = path.stat()
+            with open(self.manifest_path(document_type, path, variant), encoding='utf-8') as source:
+                manifest = json.load(source)
+            if (manifest['mtime_ns'], manifest['size']) != (stat.st_mtime_ns, stat.st_size):
+                return None
+            entries: List[Any] = manifest['entries']
+        except Exception:
+            # Missing, corrupt or incompatible manifests are all treated as a miss.
+            return None
+        return entries
+
+    def store_manifest(
+        self,
+        document_type: Type[Document],
+        path: Path,
+        variant: str,
+        stat: os.stat_result,
+        entries: List[Any],
+    ) -> None:
+        """
+        Store a manifest of JSON-serializable entries, usually describing the examples found
+        in the source file at the supplied path, so that it can be used in place of
+        parsing that file until it changes.
+
+        The ``variant`` should describe anything other than the parsers that affects the
+        entries, so that a change to it means they are computed again.
+
+        The ``stat`` passed should be obtained before the file is read, so that changes made
+        while it is being parsed invalidate the manifest.
+        """
+        manifest = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'entries': entries}
+        self.store_json(self.manifest_path(document_type, path, variant), manifest)
+
+    def result_path(self, document_type: Type[Document], path: Path, name: str) -> Path:
+        key = self.digest(document_type, str(path), name)
+        return self.path / 'results' / f'{key}.json'
+
+    def unchanged(self, document_type: Type[Document], path: Path, name: str) -> bool:
+        """
+        Return ``True`` if neither the source file at the supplied path nor any of the
+        modules recorded by :meth:`store_result` have changed since it was called.
+        """
+        try:
+            with open(self.result_path(document_type, path, name), encoding='utf-8') as source:
+                result = json.load(source)
+            if result['text'] != file_hash(str(path)):
+                return False
+            return all(file_hash(filename) == digest for filename, digest in result['modules'])
+        except Exception:
+            # Missing, corrupt or incompatible results all mean the file must be evaluated.
+            return False
+
+    def store_result(
+        self, document_type: Type[Document], path: Path, name: str, text_hash: Optional[str]
+    ) -> None:
+        """
+        Record that all the examples in the source file at the supplied path passed, along
+        with the hashes of the source files of all the :func:`project modules
+        <project_module_files>` imported so far.
+
+        The ``text_hash`` passed should be obtained using :func:`file_hash` before the file is
+        parsed, so that changes made while its examples are evaluated are not missed.
+        """
+        modules = [(filename, file_hash(filename)) for filename in project_module_files()]
+        result = {'text': text_hash, 'modules': modules}
+        self.store_json(self.result_path(document_type, path, name), result)
+
+
+class CodeCache:
+    """
+    A cache of compiled Python code objects for the examples in one
+    :class:`~sybil.Document`, keyed on the source compiled along with everything else
+    that affects the code object produced.
+
+    Code objects are kept in memory for as long as the cache is and, if a :attr:`path`
+    is supplied, are also stored there using :mod:`marshal` so that later processes
+    don't need to compile them again. Keys should not include line numbers, so that
+    stored code can still be used when the lines above an example change.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        #: The directory in which compiled code is stored between runs, if any.
+        self.path: Optional[Path] = path
+        self.codes: Dict[Tuple[Any, ...], CodeType] = {}
+
+    def entry_path(self, path: Path, key: Tuple[Any, ...]) -> Path:
+        digest = hashlib.sha256(MAGIC_NUMBER)
+        digest.update(repr(key).encode('utf-8', 'surrogatepass'))
+        name = digest.hexdigest()
+        return path / 'code' / name[:2] / f'{name}.marshal'
+
+    def load(self, path: Path) -> Optional[CodeType]:
+        try:
+            code = marshal.loads(path.read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    def store(self, path: Path, code: CodeType) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as target:
+                marshal.dump(code, target)
+            os.replace(target.name, path)
+        except OSError:
+            # The cache is only an optimisation, so a read-only or full disk isn't an error:
+            pass
+
+    def get(
+        self, key: Tuple[Any, ...], compile_: Callable[[], Optional[CodeType]]
+    ) -> Optional[CodeType]:
+        """
+        Return the code object for the supplied key, calling ``compile_`` to obtain
+        it if it has not been cached. Exceptions raised by ``compile_``, along with any
+        ``None`` it returns, are not cached.
+        """
+        code = self.codes.get(key)
+        if code is not None:
+            return code
+        entry_path = None if self.path is None else self.entry_path(self.path, key)
+        if entry_path is not None:
+            code = self.load(entry_path)
+        if code is None:
+            code = compile_()
+            if code is None:
+                return None
+            if entry_path is not None:
+                self.store(entry_path, code)
+        self.codes[key] = code
+        return code
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _precompile(document: Document) -> None:
+    for example in document.examples():
+        precompile_example = getattr(example.region.evaluator, 'precompile', None)
+        if precompile_example is not None:
+            try:
+                precompile_example(example)
+            except Exception:
+                # Problems such as syntax errors will be reported when the example
+                # is evaluated, as they are not cached:
+                pass
+
+
+def precompile(document: Document) -> 'Future[None]':
+    """
+    Compile the examples in the supplied document in a background thread, so that the
+    compiled code is ready in the document's :attr:`~sybil.Document.code_cache` by the time
+    they are evaluated.
+
+    Only examples with an :any:`Evaluator` that has a ``precompile`` method,
+    such as :class:`~sybil.evaluators.python.PythonEvaluator`, are compiled.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix='sybil-precompile')
+    return _executor.submit(_precompile, document)
+
+
+def shutdown_precompile() -> None:
+    """
+    Stop the background threads used by :func:`precompile`, discarding any documents
+    still waiting to be compiled. New threads are started if :func:`precompile` is
+    called again.
+    """
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
@@ -2,19 +2,23 @@ import ast
 import re
 from ast import AsyncFunctionDef, FunctionDef, ClassDef, Constant, Module, Expr
 from bisect import bisect
-from collections.abc import Iterator
+from collections import deque
+from collections.abc import Iterable, Iterator
 from io import open
 from itertools import chain
 from pathlib import Path
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Deque, Dict, Hashable, Optional, Union
 from typing import List, Tuple
 
 from .example import Example, SybilFailure, NotEvaluated
 from .python import import_path
 from .region import Region
-from .text import LineNumberOffsets
+from .text import LineNumberOffsets, combined_markers
 from .typing import Parser, Evaluator
 
+if TYPE_CHECKING:
+    from .cache import CodeCache
+
 
 class Document:
     """
@@ -38,6 +42,14 @@ class Document:
         #: this document will be evaluated.
         self.namespace: Dict[str, Any] = {}
         self.evaluators: list[Evaluator] = []
+        #: This dictionary is used by :term:`lexers <Lexer>` to share the results
+        #: of lexing this document between the parsers that use them.
+        #: It is cleared once the document has been parsed.
+        self.lexed: Dict[Hashable, Any] = {}
+        #: The cache of compiled code used by evaluators of Python examples in this
+        #: document, if any. :class:`~sybil.Sybil` sets this when parsing documents.
+        self.code_cache: Optional['CodeCache'] = None
+        self._line_offsets: Optional[LineNumberOffsets] = None
 
     @classmethod
     def parse(cls, path: str, *parsers: Parser, encoding: str = 'utf-8') -> 'Document':
@@ -48,19 +60,26 @@ class Document:
         with open(path, encoding=encoding) as source:
             text = source.read()
         document = cls(text, path)
-        for parser in parsers:
-            for region in parser(document):
-                document.add(region)
+        document.add_all(region for parser in parsers for region in parser(document))
+        # Lexing results are only shared while parsing, so don't keep them alive:
+        document.lexed.clear()
         return document
 
+    @property
+    def line_offsets(self) -> LineNumberOffsets:
+        """
+        The index of line offsets for this document's text, built the first time it is needed.
+        """
+        if self._line_offsets is None:
+            self._line_offsets = LineNumberOffsets(self.text)
+        return self._line_offsets
+
     def line_column(self, position: int) -> str:
         """
         Return a line and column location in this document based on a character
         position.
         """
-        line = self.text.count('\n', 0, position) + 1
-        col = position - self.text.rfind('\n', 0, position)
-        return 'line {}, column {}'.format(line, col)
+        return 'line {}, column {}'.format(*self.line_offsets.line_column(position))
 
     def region_details(self, region: Region) -> str:
         return '{!r} from {} to {}'.format(
@@ -74,6 +93,11 @@ class Document:
         raise ValueError('{} overlaps {}'.format(*reprs))
 
     def add(self, region: Region) -> None:
+        """
+        Add a region to this document, keeping the regions sorted by their start position.
+        A :class:`ValueError` is raised if the region lies outside the document's text or
+        overlaps a region that has already been added.
+        """
         if region.start < 0:
             raise ValueError('{} is before start of document'.format(self.region_details(region)))
         if region.end > self.end:
@@ -90,17 +114,44 @@ class Document:
                 self.raise_overlap(region, next)
         self.regions.insert(index, entry)
 
+    def add_all(self, regions: Iterable[Region]) -> None:
+        """
+        Add several regions to this document. This is equivalent to calling :meth:`add`
+        with each region in turn, but the regions are sorted and checked for overlaps
+        in one go.
+        """
+        added = list(regions)
+        # Regions with the same start are ordered as add() would leave them, with those
+        # added later coming first:
+        entries = sorted(
+            chain(
+                ((start, i, region) for i, (start, region) in enumerate(self.regions)),
+                ((region.start, -1 - i, region) for i, region in enumerate(added)),
+            ),
+            key=lambda entry: (entry[0], entry[1]),
+        )
+        previous = None
+        for start, _, region in entries:
+            if start < 0 or region.end > self.end:
+                break
+            if previous is not None and previous.end > start:
+                break
+            previous = region
+        else:
+            self.regions = [(start, region) for start, _, region in entries]
+            return
+        # Add the regions one by one so the problem is reported exactly as add() would:
+        for region in added:
+            self.add(region)
+
     def examples(self) -> Iterator[Example]:
         """
         Return the :term:`examples <example>` contained within this document.
         """
-        line = 1
-        place = 0
+        line_offsets = self.line_offsets
         for _, region in self.regions:
-            line += self.text.count('\n', place, region.start)
-            line_start = self.text.rfind('\n', place, region.start)
-            place = region.start
-            yield Example(self, line, region.start - line_start, region, self.namespace)
+            line, column = line_offsets.line_column(region.start)
+            yield Example(self, line, column, region, self.namespace)
 
     def __iter__(self) -> Iterator[Example]:
         return self.examples()
@@ -147,6 +198,29 @@ class Document:
 
 DOCSTRING_PUNCTUATION = re.compile('[rf]?(["\']{3}|["\'])')
 
+# The nodes that can have docstrings, along with those that can contain such nodes:
+DOCSTRING_NODES = (AsyncFunctionDef, FunctionDef, ClassDef, Module)
+CONTAINER_NODES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+
+def docstring_nodes(
+    module: Module,
+) -> Iterator[Union[AsyncFunctionDef, FunctionDef, ClassDef, Module]]:
+    """
+    Yield the nodes in the supplied module that can have docstrings, in the same order as
+    :func:`ast.walk` would, but only descending into the statements that may contain them
+    rather than every expression.
+    """
+    todo: Deque[ast.AST] = deque([module])
+    while todo:
+        node = todo.popleft()
+        if isinstance(node, DOCSTRING_NODES):
+            yield node
+        for name in node._fields:
+            value = getattr(node, name, None)
+            if isinstance(value, list):
+                todo.extend(item for item in value if isinstance(item, CONTAINER_NODES))
+
 
 class PythonDocument(Document):
     """
@@ -177,11 +251,12 @@ class PythonDocStringDocument(PythonDocument):
     """
 
     @staticmethod
-    def extract_docstrings(python_source_code: str) -> Iterator[Tuple[int, int, str]]:
-        line_offsets = LineNumberOffsets(python_source_code)
-        for node in ast.walk(ast.parse(python_source_code)):
-            if not isinstance(node, (AsyncFunctionDef, FunctionDef, ClassDef, Module)):
-                continue
+    def extract_docstrings(
+        python_source_code: str, line_offsets: Optional[LineNumberOffsets] = None
+    ) -> Iterator[Tuple[int, int, str]]:
+        if line_offsets is None:
+            line_offsets = LineNumberOffsets(python_source_code)
+        for node in docstring_nodes(ast.parse(python_source_code)):
             if not (node.body and isinstance(node.body[0], Expr)):
                 continue
             docstring = node.body[0].value
@@ -209,11 +284,17 @@ class PythonDocStringDocument(PythonDocument):
         """
         with open(path, encoding=encoding) as source:
             document = cls(source.read(), path)
-            for start, end, text in cls.extract_docstrings(document.text):
+            markers = combined_markers(parsers)
+            if markers is not None and not any(marker in document.text for marker in markers):
+                # None of the parsers could find anything, so don't look for docstrings:
+                return document
+            regions = []
+            for start, end, text in cls.extract_docstrings(document.text, document.line_offsets):
                 docstring_document = cls(text, path)
                 for parser in parsers:
                     for region in parser(docstring_document):
                         region.start += start
                         region.end += start
-                        document.add(region)
+                        regions.append(region)
+            document.add_all(regions)
         return document
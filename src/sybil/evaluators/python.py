@@ -1,4 +1,8 @@
+import warnings
 from collections.abc import Sequence
+from threading import Lock
+from types import CodeType
+from typing import Optional, cast
 import __future__
 
 from sybil import Example
@@ -13,6 +17,55 @@ def pad(source: str, line: int) -> str:
     return line * '\n' + source
 
 
+_capture_lock = Lock()
+
+
+def relocate(code: CodeType, lines: int) -> CodeType:
+    """
+    Return a copy of the supplied code object, and any code objects nested within it,
+    with all line numbers moved down by the number of lines provided.
+    """
+    consts = tuple(
+        relocate(const, lines) if isinstance(const, CodeType) else const for const in code.co_consts
+    )
+    return code.replace(co_firstlineno=code.co_firstlineno + lines, co_consts=consts)
+
+
+def compile_unpadded(source: str, path: str, flags: int = 0) -> Optional[CodeType]:
+    """
+    Compile the supplied source with line numbers starting from the first line, ready to be
+    moved using :func:`relocate`. ``None`` is returned if the source needs to be padded to get
+    line numbers right, such as when the messages of syntax errors would include them or
+    compiling it issues warnings, such as :class:`SyntaxWarning`, which report them.
+    """
+    # Warning filters are global, so make sure the precompile thread can't interleave
+    # with evaluation here:
+    with _capture_lock, warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            code: CodeType = compile(source, path, 'exec', flags=flags, dont_inherit=True)
+        except SyntaxError:
+            return None
+    if caught:
+        return None
+    return code
+
+
+def compile_padded(source: str, path: str, line: int, flags: int = 0) -> CodeType:
+    return cast(CodeType, compile(pad(source, line), path, 'exec', flags=flags, dont_inherit=True))
+
+
+def compile_at(source: str, path: str, line: int, flags: int = 0) -> CodeType:
+    """
+    Compile the supplied source such that line numbers will be based on the one provided,
+    as with :func:`pad`, but without the cost of compiling the padding where possible.
+    """
+    code = compile_unpadded(source, path, flags)
+    if code is None:
+        return compile_padded(source, path, line, flags)
+    return relocate(code, line)
+
+
 class PythonEvaluator:
     """
     The :any:`Evaluator` to use for :class:`Regions <sybil.Region>` containing
@@ -28,11 +81,35 @@ class PythonEvaluator:
         for future_import in future_imports:
             self.flags |= getattr(__future__, future_import).compiler_flag
 
+    def compile(self, example: Example) -> CodeType:
+        """
+        Return the compiled code for the supplied example, using the document's
+        :attr:`~sybil.Document.code_cache` if it has one.
+        """
+        source = str(example.parsed)
+        path = example.path
+        line = example.line + example.parsed.line_offset
+        code_cache = example.document.code_cache
+        if code_cache is None:
+            return compile_at(source, path, line, self.flags)
+        # Code is cached before it is relocated, so it can be reused when lines above it change:
+        code = code_cache.get(
+            ('exec', source, path, self.flags),
+            lambda: compile_unpadded(source, path, self.flags),
+        )
+        if code is None:
+            return compile_padded(source, path, line, self.flags)
+        return relocate(code, line)
+
+    def precompile(self, example: Example) -> None:
+        """
+        Compile the supplied example ahead of it being evaluated.
+        """
+        self.compile(example)
+
     def __call__(self, example: Example) -> None:
         __tracebackhide__ = True
-        # There must be a nicer way to get line numbers to be correct...
-        source = pad(example.parsed, example.line + example.parsed.line_offset)
-        code = compile(source, example.path, 'exec', flags=self.flags, dont_inherit=True)
+        code = self.compile(example)
         exec(code, example.namespace)
         # exec adds __builtins__, we don't want it:
         del example.namespace['__builtins__']
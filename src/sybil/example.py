@@ -35,6 +35,18 @@ class Example:
     evaluator.
     """
 
+    __slots__ = (
+        'document',
+        'path',
+        'line',
+        'column',
+        'region',
+        'start',
+        'end',
+        'parsed',
+        'namespace',
+    )
+
     def __init__(
         self,
         document: 'Document',
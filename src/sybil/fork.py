@@ -0,0 +1,156 @@
+import os
+import pickle
+import sys
+import traceback
+from collections.abc import Sequence
+from typing import IO, List, Optional, Tuple, Type, cast
+from unittest import SkipTest
+
+from .example import Example, SybilFailure
+
+#: The outcome of evaluating an example, as a kind along with any text describing it.
+Result = Tuple[str, str]
+
+
+class ForkedFailure(Exception):
+    """
+    Raised in place of an exception that occurred when evaluating an example in a
+    forked process. The message is the text of the original exception and its traceback.
+    """
+
+
+def skip_exceptions() -> Tuple[Type[BaseException], ...]:
+    """
+    Return the types of exception raised to skip an example, including the one raised by
+    :func:`pytest.skip` when pytest is in use.
+    """
+    pytest = sys.modules.get('pytest')
+    if pytest is None:
+        return (SkipTest,)
+    return SkipTest, pytest.skip.Exception
+
+
+def evaluate_examples(examples: Sequence[Example], requests: IO[bytes], output: IO[bytes]) -> None:
+    """
+    Evaluate the supplied examples in order, each one only once a byte has been read from
+    ``requests``, writing the result of each to the output supplied as soon as it is known.
+    Evaluation stops when there are no more requests.
+    """
+    skips = skip_exceptions()
+    for example in examples:
+        if not requests.read(1):
+            return
+        result: Result
+        try:
+            example.evaluate()
+        except SybilFailure as e:
+            result = 'failure', e.result
+        except skips as e:
+            result = 'skip', str(e)
+        except BaseException as e:
+            # This includes pytest.fail() and sys.exit(), which would otherwise end the
+            # process without reporting a result:
+            result = 'error', ''.join(traceback.format_exception(e))
+        else:
+            result = 'pass', ''
+        pickle.dump(result, output)
+        output.flush()
+
+
+class ForkedExamples:
+    """
+    Evaluate examples from a :class:`~sybil.Document` in a child process forked from the
+    current one, such that they start with a copy of the document's
+    :attr:`~sybil.Document.namespace` and anything else already set up in this process,
+    but have no effect on this process.
+
+    The child process is forked when the first example is evaluated. It then evaluates
+    each example in turn, only once this process asks for its result, so that anything
+    it writes to the standard output and error file descriptors is written while the test
+    for that example is running.
+
+    :param examples:
+        The examples to evaluate, in the order they should be evaluated.
+    """
+
+    def __init__(self, examples: Sequence[Example]) -> None:
+        self.examples = list(examples)
+        self.indexes = {id(example): i for i, example in enumerate(self.examples)}
+        self.results: List[Result] = []
+        self.pid: Optional[int] = None
+        self.requests: Optional[IO[bytes]] = None
+        self.input: Optional[IO[bytes]] = None
+        self.status: Optional[int] = None
+
+    def start(self) -> None:
+        request_read_fd, request_write_fd = os.pipe()
+        read_fd, write_fd = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - Only in the child process!
+            try:
+                os.close(request_write_fd)
+                os.close(read_fd)
+                with os.fdopen(request_read_fd, 'rb', buffering=0) as requests:
+                    with os.fdopen(write_fd, 'wb') as output:
+                        evaluate_examples(self.examples, requests, output)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(0)
+        os.close(request_read_fd)
+        os.close(write_fd)
+        self.pid = pid
+        self.requests = os.fdopen(request_write_fd, 'wb', buffering=0)
+        self.input = os.fdopen(read_fd, 'rb')
+
+    def request(self) -> Optional[Result]:
+        # Ask the forked process to evaluate the next example and wait for its result:
+        assert self.requests is not None and self.input is not None
+        try:
+            self.requests.write(b'.')
+            return cast(Result, pickle.load(self.input))
+        except (BrokenPipeError, EOFError):
+            self.finish()
+            return None
+
+    def result(self, index: int) -> Result:
+        if self.input is None:
+            self.start()
+        while len(self.results) <= index and self.status is None:
+            result = self.request()
+            if result is not None:
+                self.results.append(result)
+        if index < len(self.results):
+            return self.results[index]
+        return 'error', (
+            f'Forked process exited with status {self.status} before evaluating this example'
+        )
+
+    def evaluate(self, example: Example) -> None:
+        """
+        Raise the exception, if any, that resulted from evaluating the supplied example
+        in the forked process, starting that process if necessary.
+        """
+        __tracebackhide__ = True
+        kind, text = self.result(self.indexes[id(example)])
+        if kind == 'failure':
+            raise SybilFailure(example, text)
+        if kind == 'skip':
+            raise SkipTest(text)
+        if kind == 'error':
+            raise ForkedFailure(text)
+
+    def finish(self) -> Optional[int]:
+        """
+        Wait for the forked process to exit, once it has no more examples to evaluate,
+        and return its exit status.
+        """
+        if self.pid is not None and self.status is None:
+            assert self.requests is not None and self.input is not None
+            self.requests.close()
+            self.input.close()
+            _, status = os.waitpid(self.pid, 0)
+            self.status = os.waitstatus_to_exitcode(status)
+        return self.status
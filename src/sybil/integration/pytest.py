@@ -1,11 +1,14 @@
 from __future__ import absolute_import
 
 import os
-from collections.abc import Callable, Sequence
+import subprocess
+import sys
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from inspect import getsourcefile
 from os.path import abspath
 from pathlib import Path
-from typing import Union, Tuple, Optional, List
+from typing import Dict, Union, Tuple, Optional, List, NamedTuple, Set
+from unittest import SkipTest
 
 import pytest
 from pytest import Collector, ExceptionInfo, Module, Session
@@ -15,12 +18,87 @@ from _pytest._io import TerminalWriter
 from _pytest.fixtures import FuncFixtureInfo
 
 from sybil import example as example_module, Sybil, Document
+from sybil.cache import file_hash, shutdown_precompile
 from sybil.example import Example
 from sybil.example import SybilFailure
+from sybil.evaluators.skip import Skipper
+from sybil.fork import ForkedExamples, ForkedFailure
+from sybil.parsers.abstract.clear import AbstractClearNamespaceParser
+from sybil.sybil import check_compatible
 
 example_module_path = abspath(getsourcefile(example_module))
 
 
+def independent_chunks(examples: Iterable[Example], split: bool) -> Iterator[List[Example]]:
+    """
+    Split the supplied examples from a document into chunks that can be evaluated
+    independently of each other.
+
+    When ``split`` is ``False`` there is only one chunk, otherwise a new chunk starts with
+    each :ref:`clear-namespace <clear-namespace>` example that isn't being skipped.
+    """
+    chunk: List[Example] = []
+    # A clear-namespace example that is skipped doesn't clear anything:
+    skip_action: Optional[str] = None
+    for example in examples:
+        evaluator = example.region.evaluator
+        if isinstance(evaluator, Skipper):
+            action = example.parsed[0]
+            skip_action = action if action in ('start', 'next') else None
+        else:
+            if split and skip_action is None and evaluator is AbstractClearNamespaceParser.evaluate:
+                if chunk:
+                    yield chunk
+                chunk = []
+            if skip_action == 'next':
+                skip_action = None
+        chunk.append(example)
+    if chunk:
+        yield chunk
+
+
+class ExampleInfo(NamedTuple):
+    """
+    What's needed to collect an example without parsing the document it comes from.
+    """
+
+    #: The name of the item, as returned by :meth:`sybil.Sybil.identify`.
+    name: str
+    line: int
+    column: int
+    #: The line of the first example in the :func:`independent chunk <independent_chunks>`
+    #: this example is in.
+    chunk: int
+
+
+def example_infos(sybil: Sybil, document: Document) -> List[ExampleInfo]:
+    examples = document.examples()
+    return [
+        ExampleInfo(sybil.identify(example), example.line, example.column, chunk[0].line)
+        for chunk in independent_chunks(examples, sybil.split_at_clear_namespace)
+        for example in chunk
+    ]
+
+
+def manifest_variant(sybil: Sybil) -> str:
+    """
+    Describe the options of the supplied :class:`~sybil.Sybil` that affect the
+    :class:`ExampleInfo` entries computed for a document, including the source of its
+    :meth:`~sybil.Sybil.identify` method, which may be overridden.
+    """
+    identify = getattr(sybil.identify, '__func__', sybil.identify)
+    module = identify.__module__
+    filename = getattr(sys.modules.get(module), '__file__', None)
+    return '\0'.join(
+        (
+            sybil.name,
+            repr(sybil.split_at_clear_namespace),
+            f'{module}.{identify.__qualname__}',
+            (file_hash(filename) if filename else None) or '',
+        )
+    )
+
+
 class SybilFailureRepr(TerminalRepr):
     def __init__(self, item: 'SybilItem', message: str) -> None:
         self.item = item
@@ -32,17 +110,27 @@ class SybilFailureRepr(TerminalRepr):
             tw.line(line)
         tw.line()
         tw.write(self.item.parent.name, bold=True, red=True)
-        tw.line(":%s: SybilFailure" % self.item.example.line)
+        tw.line(":%s: SybilFailure" % self.item.info.line)
 
 
 class SybilItem(pytest.Item):
     obj = None
 
-    def __init__(self, parent, sybil, example: Example) -> None:
-        super(SybilItem, self).__init__(sybil.identify(example), parent)
-        self.example = example
+    def __init__(self, parent, sybil, index: int, position: int, info: ExampleInfo) -> None:
+        super(SybilItem, self).__init__(info.name, parent)
+        self.sybil = sybil
+        #: The index of the :class:`~sybil.Sybil` in the file's sybils.
+        self.index = index
+        #: The position of the example in the document's examples.
+        self.position = position
+        self.info = info
         self.request_fixtures(sybil.fixtures)
 
+    @property
+    def example(self) -> Example:
+        # The document is only parsed when needed, such as when this item is run:
+        return self.parent.examples(self.index)[self.position]
+
     def request_fixtures(self, names):
         # pytest fixtures dance:
         fm = self.session._fixturemanager
@@ -54,14 +142,27 @@ class SybilItem(pytest.Item):
             names_closure=names_closure,
             name2fixturedefs=arg2fixturedefs,
         )
+        if self.sybil.fork:
+            # Examples are evaluated in a process forked when the first of them runs, so
+            # they'd never see the values of fixtures set up again for later items:
+            function_scoped = [
+                name
+                for name in names
+                if name in arg2fixturedefs and arg2fixturedefs[name][-1].scope == 'function'
+            ]
+            if function_scoped:
+                raise ValueError(
+                    f'fork=True cannot be used with function-scoped fixtures: '
+                    f'{", ".join(function_scoped)}'
+                )
         self._fixtureinfo = fixtureinfo
         self.funcargs = {}
         self._request = fixtures.TopRequest(pyfuncitem=self, _ispytest=True)
         self.fixturenames = names_closure
 
     def reportinfo(self) -> Tuple[Union["os.PathLike[str]", str], Optional[int], str]:
-        info = '%s line=%i column=%i' % (self.path.name, self.example.line, self.example.column)
-        return self.example.path, self.example.line, info
+        info = '%s line=%i column=%i' % (self.path.name, self.info.line, self.info.column)
+        return str(self.path), self.info.line, info
 
     def getparent(self, cls):
         if cls is Module:
@@ -70,12 +171,25 @@ class SybilItem(pytest.Item):
             return self.session
 
     def setup(self) -> None:
+        if self.index in self.parent.unchanged:
+            pytest.skip('unchanged since all examples last passed')
         self._request._fillfixtures()
         for name, fixture in self.funcargs.items():
             self.example.namespace[name] = fixture
 
     def runtest(self) -> None:
-        self.example.evaluate()
+        try:
+            if self.sybil.fork:
+                self.parent.forked_examples(self.index).evaluate(self.example)
+            else:
+                self.example.evaluate()
+        except SkipTest:
+            self.parent.passed[self.index].add(self.position)
+            raise
+        self.parent.passed[self.index].add(self.position)
+
+    def teardown(self) -> None:
+        self.parent.finished.add((self.index, self.position))
 
     def _traceback_filter(self, excinfo: ExceptionInfo[BaseException]) -> Traceback:
         traceback = excinfo.traceback
@@ -92,41 +206,226 @@ class SybilItem(pytest.Item):
     ) -> Union[str, TerminalRepr]:
         if isinstance(excinfo.value, SybilFailure):
             return SybilFailureRepr(self, str(excinfo.value))
+        if isinstance(excinfo.value, ForkedFailure):
+            return str(excinfo.value)
         return super().repr_failure(excinfo, style)
 
 
+selected_items_key = pytest.StashKey[Dict[str, int]]()
+
+
+def selected_items(session: Session) -> Dict[str, int]:
+    """
+    Return the number of items selected to run from each documentation source file,
+    keyed on the node id of that file. These are only counted once per test run.
+    """
+    counts = session.stash.get(selected_items_key, None)
+    if counts is None:
+        counts = session.stash[selected_items_key] = {}
+        for item in session.items:
+            if isinstance(item, SybilItem):
+                nodeid = item.parent.nodeid
+                counts[nodeid] = counts.get(nodeid, 0) + 1
+    return counts
+
+
+forked_items_key = pytest.StashKey[Dict[Tuple[str, int], List[SybilItem]]]()
+
+
+def forked_items(session: Session) -> Dict[Tuple[str, int], List[SybilItem]]:
+    """
+    Return the items selected to run whose examples are evaluated in a forked process,
+    in the order they will run, keyed on the node id of their file and the index of their
+    :class:`~sybil.Sybil`. These are only found once per test run.
+    """
+    items = session.stash.get(forked_items_key, None)
+    if items is None:
+        items = session.stash[forked_items_key] = {}
+        for item in session.items:
+            if isinstance(item, SybilItem) and item.sybil.fork:
+                items.setdefault((item.parent.nodeid, item.index), []).append(item)
+    return items
+
+
 class SybilFile(pytest.File):
     def __init__(self, *, sybils: Sequence[Sybil], **kwargs) -> None:
         super(SybilFile, self).__init__(**kwargs)
         self.sybils: Sequence[Sybil] = sybils
-        self.documents: List[Document] = []
+        self.documents: Dict[int, Document] = {}
+        self._examples: Dict[int, List[Example]] = {}
+        self.forked: Dict[int, ForkedExamples] = {}
+        #: The indexes of sybils whose examples are skipped as nothing has changed.
+        self.unchanged: Set[int] = set()
+        #: The hashes of the source file when it was parsed, for each sybil recording results.
+        self.text_hashes: Dict[int, Optional[str]] = {}
+        #: The positions of examples that passed or were skipped, for each sybil.
+        self.passed: Dict[int, Set[int]] = {index: set() for index in range(len(sybils))}
+        #: The indexes of the sybils and positions of the examples of items that have run.
+        self.finished: Set[Tuple[int, int]] = set()
+
+    def document(self, index: int) -> Document:
+        document = self.documents.get(index)
+        if document is None:
+            document = self.documents[index] = self.sybils[index].parse(self.path)
+        return document
+
+    def examples(self, index: int) -> List[Example]:
+        examples = self._examples.get(index)
+        if examples is None:
+            examples = self._examples[index] = list(self.document(index).examples())
+        return examples
+
+    def example_infos(self, index: int) -> List[ExampleInfo]:
+        sybil = self.sybils[index]
+        cache = sybil.cache
+        if cache is None:
+            return example_infos(sybil, self.document(index))
+        # With a cache, a manifest of the examples means unchanged files need not be parsed:
+        document_type = sybil.document_type(self.path)
+        variant = manifest_variant(sybil)
+        entries = cache.load_manifest(document_type, self.path, variant)
+        if entries is not None:
+            return [ExampleInfo(*entry) for entry in entries]
+        stat = self.path.stat()
+        infos = example_infos(sybil, self.document(index))
+        cache.store_manifest(document_type, self.path, variant, stat, infos)
+        return infos
 
     def collect(self):
-        for sybil in self.sybils:
-            document = sybil.parse(self.path)
-            self.documents.append(document)
-            for example in document.examples():
-                yield SybilItem.from_parent(
-                    self,
-                    sybil=sybil,
-                    example=example,
+        # Only mark items with groups for pytest-xdist's loadgroup scheduling when it's in use:
+        xdist = self.config.pluginmanager.hasplugin('xdist')
+        for index, sybil in enumerate(self.sybils):
+            for position, info in enumerate(self.example_infos(index)):
+                item = SybilItem.from_parent(
+                    self, sybil=sybil, index=index, position=position, info=info
                 )
+                if xdist:
+                    item.add_marker(pytest.mark.xdist_group(f'{self.nodeid}:{index}:{info.chunk}'))
+                yield item
+
+    def forked_examples(self, index: int) -> ForkedExamples:
+        forked = self.forked.get(index)
+        if forked is None:
+            # Only the examples for items that have been selected to run are evaluated:
+            items = forked_items(self.session).get((self.nodeid, index), [])
+            forked = self.forked[index] = ForkedExamples([item.example for item in items])
+        return forked
 
     def setup(self) -> None:
-        for sybil, document in zip(self.sybils, self.documents):
+        for index, sybil in enumerate(self.sybils):
+            if sybil.skip_unchanged:
+                assert sybil.cache is not None
+                if sybil.cache.unchanged(sybil.document_type(self.path), self.path, sybil.name):
+                    self.unchanged.add(index)
+                    continue
+                self.text_hashes[index] = file_hash(str(self.path))
             if sybil.setup:
-                sybil.setup(document.namespace)
+                sybil.setup(self.document(index).namespace)
 
     def teardown(self) -> None:
-        for sybil, document in zip(self.sybils, self.documents):
-            if sybil.teardown:
-                sybil.teardown(document.namespace)
+        # When items from different files are interleaved, such as by pytest-xdist, this file
+        # is set up and torn down each time its items run, but the documents, and so their
+        # namespaces, must be kept until the last of those items has run or the run stops:
+        session = self.session
+        done = bool(
+            len(self.finished) >= selected_items(session).get(self.nodeid, 0)
+            or session.shouldfail
+            or session.shouldstop
+        )
+        try:
+            if done:
+                for forked in self.forked.values():
+                    forked.finish()
+            for index, sybil in enumerate(self.sybils):
+                document = self.documents.get(index)
+                if index in self.unchanged or document is None:
+                    continue
+                examples = self._examples.get(index)
+                if (
+                    done
+                    and index in self.text_hashes
+                    and examples is not None
+                    and len(self.passed[index]) == len(examples)
+                ):
+                    # This is done before teardown, which may remove the modules imported:
+                    assert sybil.cache is not None
+                    sybil.cache.store_result(
+                        sybil.document_type(self.path),
+                        self.path,
+                        sybil.name,
+                        self.text_hashes[index],
+                    )
+                if sybil.teardown:
+                    sybil.teardown(document.namespace)
+        finally:
+            if done:
+                self.release()
+
+    def release(self) -> None:
+        """
+        Release the documents parsed for this file, along with their namespaces and
+        regions, once all of its items have run. Items only need what's in their
+        :class:`ExampleInfo` to be reported.
+        """
+        for document in self.documents.values():
+            # Clearing these breaks the reference cycles formed by functions and classes
+            # defined in examples, so memory can be freed without waiting for the collector:
+            document.namespace.clear()
+            document.regions = []
+        self.documents.clear()
+        self._examples.clear()
+        self.forked.clear()
+
+
+changed_paths_key = pytest.StashKey[Set[Path]]()
+precompile_cleanup_key = pytest.StashKey[bool]()
+
+
+def git(cwd: Path, *args: str) -> str:
+    try:
+        process = subprocess.run(
+            ('git',) + args, cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError:
+        raise pytest.UsageError('--sybil-changed-since requires git to be installed') from None
+    except subprocess.CalledProcessError as e:
+        raise pytest.UsageError(f'--sybil-changed-since: {e.stderr.strip()}') from None
+    return process.stdout
+
+
+def changed_paths(config: pytest.Config) -> Optional[Set[Path]]:
+    """
+    Return the paths of files changed since the git ref passed to ``--sybil-changed-since``,
+    or ``None`` if that option wasn't used. ``git`` is only run once per test run.
+    """
+    ref = config.getoption('sybil_changed_since', None)
+    if ref is None:
+        return None
+    paths = config.stash.get(changed_paths_key, None)
+    if paths is None:
+        root = Path(git(config.rootpath, 'rev-parse', '--show-toplevel').strip())
+        names = git(root, 'diff', '--name-only', '-z', ref, '--')
+        names += git(root, 'ls-files', '--others', '--exclude-standard', '-z')
+        paths = {root / name for name in names.split('\0') if name}
+        config.stash[changed_paths_key] = paths
+    return paths
 
 
 def pytest_integration(*sybils: Sybil) -> Callable[[Path, Collector], Optional[SybilFile]]:
+    check_compatible(sybils)
+
     def pytest_collect_file(file_path: Path, parent: Collector) -> Optional[SybilFile]:
         active_sybils = [sybil for sybil in sybils if sybil.should_parse(file_path)]
+        changed = changed_paths(parent.config) if active_sybils else None
+        if changed is not None and file_path.resolve() not in changed:
+            return None
         if active_sybils:
+            config = parent.config
+            if any(sybil.precompile for sybil in active_sybils) and not config.stash.get(
+                precompile_cleanup_key, False
+            ):
+                config.add_cleanup(shutdown_precompile)
+                config.stash[precompile_cleanup_key] = True
             return SybilFile.from_parent(parent, path=file_path, sybils=active_sybils)
         return None
 
@@ -0,0 +1,17 @@
+"""
+A pytest plugin that adds command line options for :ref:`pytest_integration`.
+It can be enabled by passing ``-p sybil.integration.pytest_plugin`` to pytest.
+"""
+
+import pytest
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        '--sybil-changed-since',
+        metavar='REF',
+        help=(
+            'Only collect examples from documentation source files that have changed since '
+            'the supplied git ref, or that are not yet tracked by git.'
+        ),
+    )
@@ -1,15 +1,22 @@
-from collections.abc import Callable
-from typing import Any, Dict, Optional
-from unittest import TestCase as BaseTestCase, TestSuite
+from collections.abc import Callable, Iterator
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from unittest import TestCase as BaseTestCase, TestResult, TestSuite
 from unittest.loader import TestLoader
 
 from sybil import Sybil
+from sybil.cache import shutdown_precompile
 from sybil.example import Example
+from sybil.fork import ForkedExamples
+from sybil.paths import walk_files
+from sybil.sybil import check_compatible
 
 
 class TestCase(BaseTestCase):
     sybil: Sybil
     namespace: Dict[str, Any]
+    forked: Optional[ForkedExamples] = None
 
     def __init__(self, example: Example) -> None:
         BaseTestCase.__init__(self)
@@ -17,7 +24,10 @@ class TestCase(BaseTestCase):
 
     def runTest(self) -> None:
         __tracebackhide__ = True
-        self.example.evaluate()
+        if self.forked is not None:
+            self.forked.evaluate(self.example)
+        else:
+            self.example.evaluate()
 
     def id(self) -> str:
         return f'{self.example.path},{self.sybil.identify(self.example)}'
@@ -31,36 +41,116 @@ class TestCase(BaseTestCase):
 
     @classmethod
     def tearDownClass(cls) -> None:
+        if cls.forked is not None:
+            cls.forked.finish()
         if cls.sybil.teardown is not None:
             cls.sybil.teardown(cls.namespace)
+        # Release the document's namespace, as the runner may keep this class for a while:
+        cls.namespace = {}
+        cls.forked = None
+
+
+class ParseFailure(BaseTestCase):
+    """
+    A test that reports an exception raised when parsing a documentation source file.
+    """
+
+    def __init__(self, path: Path, exception: Exception) -> None:
+        BaseTestCase.__init__(self)
+        self.path = path
+        self.exception = exception
+
+    def runTest(self) -> None:
+        raise self.exception
+
+    def id(self) -> str:
+        return str(self.path)
+
+    __str__ = __repr__ = id
+
+
+class DocumentSuite(TestSuite):
+    """
+    A suite of tests for the examples in a documentation source file, where the file is
+    only parsed once the runner reaches this suite.
+    """
+
+    def __init__(self, sybil: Sybil, path: Path) -> None:
+        super().__init__()
+        self.sybil = sybil
+        self.path = path
+        self.loaded = False
+
+    def load(self) -> None:
+        sybil = self.sybil
+        try:
+            document = sybil.parse(self.path)
+            examples = list(document.examples())
+        except Exception as e:
+            self.addTest(ParseFailure(self.path, e))
+            return
+        case = type(
+            document.path,
+            (TestCase,),
+            dict(
+                sybil=sybil,
+                namespace=document.namespace,
+                forked=ForkedExamples(examples) if sybil.fork else None,
+            ),
+        )
+        for example in examples:
+            self.addTest(case(example))
+
+    def __iter__(self) -> Iterator[Union[BaseTestCase, TestSuite]]:
+        if not self.loaded:
+            self.loaded = True
+            self.load()
+        return super().__iter__()
+
+
+class SybilSuite(TestSuite):
+    """
+    The suite of tests for all the documentation source files found, which stops any
+    background precompilation once they have run.
+    """
+
+    def run(self, result: TestResult, debug: bool = False) -> TestResult:
+        try:
+            return super().run(result, debug)
+        finally:
+            shutdown_precompile()
+
+
+def excluded(sybils: List[Sybil], directory: Path) -> bool:
+    return not any(sybil.should_search(directory) for sybil in sybils)
 
 
 def unittest_integration(
     *sybils: Sybil,
 ) -> Callable[[Optional[TestLoader], Optional[TestSuite], Optional[str]], TestSuite]:
+    check_compatible(sybils)
+
     def load_tests(
         loader: Optional[TestLoader] = None,
         tests: Optional[TestSuite] = None,
         pattern: Optional[str] = None,
     ) -> TestSuite:
-        suite = TestSuite()
-        for sybil in sybils:
-            for path in sorted(sybil.path.glob('**/*')):
-                if path.is_file() and sybil.should_parse(path):
-                    document = sybil.parse(path)
-
-                    case = type(
-                        document.path,
-                        (TestCase,),
-                        dict(
-                            sybil=sybil,
-                            namespace=document.namespace,
-                        ),
-                    )
-
-                    for example in document.examples():
-                        suite.addTest(case(example))
+        # Sybils using the same path share one walk of it, which only skips directories
+        # that all of them exclude:
+        groups: Dict[Path, List[int]] = {}
+        for index, sybil in enumerate(sybils):
+            groups.setdefault(sybil.path, []).append(index)
+        documents: List[List[DocumentSuite]] = [[] for _ in sybils]
+        for directory, indexes in groups.items():
+            skip = partial(excluded, [sybils[index] for index in indexes])
+            for path in walk_files(directory, skip):
+                for index in indexes:
+                    if sybils[index].should_parse(path):
+                        documents[index].append(DocumentSuite(sybils[index], path))
 
+        suite = SybilSuite()
+        for found in documents:
+            suite.addTests(found)
         return suite
 
     return load_tests
@@ -1,4 +1,5 @@
 from collections.abc import Iterable, Sequence
+from typing import Optional, Tuple
 
 from sybil import Document, Region, Example
 from sybil.parsers.abstract.lexers import LexerCollection
@@ -13,6 +14,10 @@ class AbstractClearNamespaceParser:
     def __init__(self, lexers: Sequence[Lexer]) -> None:
         self.lexers = LexerCollection(lexers)
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return self.lexers.markers
+
     @staticmethod
     def evaluate(example: Example) -> None:
         example.document.namespace.clear()
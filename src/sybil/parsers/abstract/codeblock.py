@@ -1,5 +1,5 @@
 from collections.abc import Iterable, Sequence, Callable
-from typing import Optional
+from typing import Optional, Tuple
 
 from sybil import Region, Document, Example
 from sybil.typing import Evaluator, Lexer, Parser
@@ -45,6 +45,10 @@ class AbstractCodeBlockParser:
         self._evaluator: Optional[Evaluator] = evaluator
         self._language_lexeme_name = language_lexeme_name
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return self.lexers.markers
+
     def evaluate(self, example: Example) -> Optional[str]:
         """
         The :any:`Evaluator` used for regions yields by this parser can be provided by
@@ -69,6 +73,11 @@ class PythonDocTestOrCodeBlockParser:
             'python', PythonEvaluator(future_imports)
         )
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        # Doctests are only found within code blocks:
+        return getattr(self.codeblock_parser, 'markers', None)
+
     def __call__(self, document: Document) -> Iterable[Region]:
         for region in self.codeblock_parser(document):
             source = region.parsed
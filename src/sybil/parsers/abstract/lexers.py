@@ -1,11 +1,13 @@
 import re
 import textwrap
-from itertools import chain
-from collections.abc import Iterable
-from typing import Optional, Dict, Pattern, List
+from collections.abc import Hashable, Iterable, Iterator
+from copy import deepcopy
+from functools import lru_cache
+from typing import Any, Optional, Dict, Pattern, List, Match, Tuple, ItemsView, ValuesView
 
 from sybil import Document
 from sybil.region import Lexeme, Region
+from sybil.text import combined_markers
 from sybil.typing import Lexer
 
 
@@ -17,12 +19,239 @@ class LexingException(Exception):
     """
 
 
-class LexerCollection(List[Lexer]):
+class ScanningLexer:
+    """
+    This is a base class for any :any:`Lexer` that finds what it lexes by scanning the
+    text of a document for matches of its ``start_pattern``.
+
+    When several scanning lexers are used together in a :class:`LexerCollection`, the
+    matches of each start pattern are only found once for each document, and then shared
+    between all the lexers using that pattern.
+    Subclasses should implement :meth:`lex_matches` rather than overriding ``__call__``.
+    """
+
+    #: The pattern used to find the start of anything to be lexed.
+    start_pattern: Pattern[str]
+
+    #: Strings, at least one of which must be present in any text matched by the
+    #: ``start_pattern``, or ``None`` if this is not known.
+    markers: Optional[Tuple[str, ...]] = None
+
+    def lex_matches(self, document: Document, matches: Iterable[Match[str]]) -> Iterable[Region]:
+        """
+        Yield the :class:`~sybil.Region` objects for the supplied matches of the
+        ``start_pattern``, which will be in the order they were found in the document.
+        """
+        raise NotImplementedError
+
+    def lexing_key(self) -> Optional[Hashable]:
+        """
+        Return a key such that any lexers with equal keys will lex a document in exactly
+        the same way, or ``None`` if the results of this lexer should not be shared.
+
+        By default, this is made up of the lexer's type and its attributes, provided
+        they are all strings, numbers, patterns or dictionaries of these.
+        """
+        try:
+            return type(self), tuple(
+                sorted((name, hashable(value)) for name, value in vars(self).items())
+            )
+        except TypeError:
+            return None
+
     def __call__(self, document: Document) -> Iterable[Region]:
-        return chain(*(lexer(document) for lexer in self))
+        return self.lex_matches(document, re.finditer(self.start_pattern, document.text))
+
+
+def hashable(value: Any) -> Hashable:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, Pattern):
+        return 're', value.pattern, value.flags
+    if isinstance(value, dict):
+        return 'dict', tuple(sorted((key, hashable(item)) for key, item in value.items()))
+    raise TypeError(f'{value!r} is not hashable')
+
+
+class LazyLexeme:
+    """
+    A :class:`~sybil.Lexeme` that has not yet been extracted from the text of the
+    document containing it. The text is only sliced out, stripped of its prefix and
+    dedented when :meth:`resolve` is first called.
+    """
 
+    __slots__ = ('text', 'start', 'end', 'prefix', 'offset', 'line_offset', 'strip', 'lexeme')
 
-class BlockLexer:
+    def __init__(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        prefix: str,
+        offset: int,
+        line_offset: int,
+        strip: bool = False,
+    ) -> None:
+        self.text = text
+        self.start = start
+        self.end = end
+        self.prefix = prefix
+        self.offset = offset
+        self.line_offset = line_offset
+        self.strip = strip
+        self.lexeme: Optional[Lexeme] = None
+
+    def strip_leading_newlines(self) -> 'LazyLexeme':
+        return LazyLexeme(
+            self.text, self.start, self.end, self.prefix, self.offset, self.line_offset, True
+        )
+
+    def resolve(self) -> Lexeme:
+        """
+        Return the :class:`~sybil.Lexeme` this represents, extracting it from the text of the
+        document the first time this is called.
+        """
+        if self.lexeme is None:
+            lexeme = Lexeme(
+                strip_prefix(self.text[self.start : self.end], self.prefix),
+                self.offset,
+                self.line_offset,
+            )
+            if self.strip:
+                lexeme = lexeme.strip_leading_newlines()
+            self.lexeme = lexeme
+        return self.lexeme
+
+
+class Lexemes(Dict[str, Any]):
+    """
+    The :class:`dict` of lexemes returned by the lexers in Sybil. Any :class:`LazyLexeme`
+    values are replaced with the :class:`~sybil.Lexeme` they resolve to when they are first
+    looked up, so lexemes that are never used are never extracted.
+
+    Every way of reading values, including copying into another :class:`dict`, returns
+    resolved lexemes. Only ``copy()`` leaves values unresolved, in a new :class:`Lexemes`.
+    """
+
+    def __getitem__(self, name: str) -> Any:
+        value = super().__getitem__(name)
+        if isinstance(value, LazyLexeme):
+            value = value.resolve()
+            super().__setitem__(name, value)
+        return value
+
+    def resolve(self) -> None:
+        for name in self:
+            self[name]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self[name] if name in self else default
+
+    def pop(self, name: str, *default: Any) -> Any:
+        value = super().pop(name, *default)
+        return value.resolve() if isinstance(value, LazyLexeme) else value
+
+    def setdefault(self, name: str, default: Any = None) -> Any:
+        if name in self:
+            return self[name]
+        return super().setdefault(name, default)
+
+    def popitem(self) -> Tuple[str, Any]:
+        name, value = super().popitem()
+        return name, value.resolve() if isinstance(value, LazyLexeme) else value
+
+    def copy(self) -> 'Lexemes':
+        return Lexemes(super().items())
+
+    def __or__(self, other: Any) -> Any:
+        if not isinstance(other, dict):
+            return NotImplemented
+        result = self.copy()
+        result.update(other)
+        return result
+
+    def items(self) -> ItemsView[str, Any]:  # type: ignore[override]
+        self.resolve()
+        return super().items()
+
+    def values(self) -> ValuesView[Any]:  # type: ignore[override]
+        self.resolve()
+        return super().values()
+
+    def __iter__(self) -> Iterator[str]:
+        # Overriding this stops dict(), ** and dict.update() from copying unresolved values,
+        # as they then use keys() and __getitem__:
+        return super().__iter__()
+
+    def __eq__(self, other: object) -> bool:
+        self.resolve()
+        return super().__eq__(other)
+
+    def __ne__(self, other: object) -> bool:
+        self.resolve()
+        return super().__ne__(other)
+
+    def __repr__(self) -> str:
+        self.resolve()
+        return super().__repr__()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return Lexemes, (dict(self.items()),)
+
+
+def copy_region(region: Region) -> Region:
+    # The lexemes are copied without resolving any that are lazy:
+    lexemes = Lexemes(
+        (name, deepcopy(lexeme) if isinstance(lexeme, dict) else lexeme)
+        for name, lexeme in dict.items(region.lexemes)
+    )
+    return Region(region.start, region.end, region.parsed, region.evaluator, lexemes)
+
+
+class LexerCollection(List[Lexer]):
+    """
+    A sequence of :term:`lexers <Lexer>` that can itself be used as a :any:`Lexer`, yielding
+    the regions from each lexer in turn.
+
+    The matches of the start patterns of any :class:`ScanningLexer` instances in the
+    collection, along with the regions lexed from them, are stored in the document's
+    :attr:`~sybil.Document.lexed` dictionary so that other collections containing
+    equivalent lexers can re-use them.
+    Copies of stored regions are returned so that they may be modified by parsers.
+    """
+
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return combined_markers(self)
+
+    def matches(self, lexer: ScanningLexer, document: Document) -> List[Match[str]]:
+        pattern = re.compile(lexer.start_pattern)
+        key = ('matches', pattern.pattern, pattern.flags)
+        matches = document.lexed.get(key)
+        if matches is None:
+            matches = document.lexed[key] = list(pattern.finditer(document.text))
+        return matches
+
+    def __call__(self, document: Document) -> Iterator[Region]:
+        for lexer in self:
+            # Lexers that override __call__ may do more than lex matches, so are called:
+            if (
+                not isinstance(lexer, ScanningLexer)
+                or type(lexer).__call__ is not ScanningLexer.__call__
+            ):
+                yield from lexer(document)
+                continue
+            key = lexer.lexing_key()
+            regions = None if key is None else document.lexed.get(('regions', key))
+            if regions is None:
+                regions = list(lexer.lex_matches(document, self.matches(lexer, document)))
+                if key is not None:
+                    document.lexed['regions', key] = regions
+            for region in regions:
+                yield copy_region(region)
+
+
+class BlockLexer(ScanningLexer):
     """
     This is a base class useful for any :any:`Lexer` that must handle block-style languages
     such as ReStructured Text or MarkDown.
@@ -59,32 +288,67 @@ class BlockLexer:
         self.end_pattern_template = end_pattern_template
         self.mapping = mapping
 
-    def __call__(self, document: Document) -> Iterable[Region]:
-        for start_match in re.finditer(self.start_pattern, document.text):
-            source_start = start_match.end()
-            lexemes = start_match.groupdict()
-            prefix = lexemes.pop('prefix', '')
-            end_pattern = re.compile(
-                self.end_pattern_template.format(prefix=prefix, len_prefix=len(prefix))
-            )
-            end_match = end_pattern.search(document.text, source_start)
-            if end_match is None:
-                raise LexingException(
-                    f'Could not find end of {start_match.group(0)!r}, '
-                    f'starting at {document.line_column(start_match.start())}, '
-                    f'looking for {end_pattern.pattern!r} in {document.path}:\n'
-                    f'{document.text[source_start:]!r}'
-                )
-            source_end = end_match.start()
-            source = document.text[source_start:source_end]
-            lexemes['source'] = Lexeme(
-                strip_prefix(source, prefix),
-                offset=source_start - start_match.start(),
-                line_offset=start_match.group(0).count('\n') - 1,
+    def lex_matches(self, document: Document, matches: Iterable[Match[str]]) -> Iterable[Region]:
+        for start_match in matches:
+            yield self.make_region(start_match, document)
+
+    def make_region(self, start_match: Match[str], document: Document) -> Region:
+        """
+        Return the :class:`~sybil.Region` for the block started by the supplied match.
+        """
+        source_start = start_match.end()
+        prefix = start_match.group('prefix') if 'prefix' in start_match.re.groupindex else ''
+        end_pattern = compile_end_pattern(self.end_pattern_template, prefix)
+        end_match = end_pattern.search(document.text, source_start)
+        if end_match is None:
+            raise LexingException(
+                f'Could not find end of {start_match.group(0)!r}, '
+                f'starting at {document.line_column(start_match.start())}, '
+                f'looking for {end_pattern.pattern!r} in {document.path}:\n'
+                f'{document.text[source_start:]!r}'
             )
-            if self.mapping:
-                lexemes = {dest: lexemes[source] for source, dest in self.mapping.items()}
-            yield Region(start_match.start(), source_end, lexemes=lexemes)
+        source_end = end_match.start()
+        source = LazyLexeme(
+            document.text,
+            source_start,
+            source_end,
+            prefix,
+            offset=source_start - start_match.start(),
+            line_offset=start_match.group(0).count('\n') - 1,
+        )
+        lexemes = mapped_lexemes(start_match, source, self.mapping, exclude='prefix')
+        return Region(start_match.start(), source_end, lexemes=lexemes)
+
+
+@lru_cache(maxsize=1024)
+def compile_end_pattern(template: str, prefix: str) -> Pattern[str]:
+    """
+    Return the compiled end pattern for the supplied template and prefix. These are cached
+    here, rather than relying on the much smaller cache in the :mod:`re` module, as
+    there is a distinct pattern for each indentation used in each document.
+    """
+    return re.compile(template.format(prefix=prefix, len_prefix=len(prefix)))
+
+
+def mapped_lexemes(
+    match: Match[str],
+    source: LazyLexeme,
+    mapping: Optional[Dict[str, str]],
+    exclude: Optional[str] = None,
+) -> Lexemes:
+    """
+    Return the lexemes made up of the named groups in the supplied match, apart from
+    any that is excluded, followed by the source. If a mapping is supplied, only the
+    lexemes it contains are returned, renamed as it specifies.
+    """
+    if mapping:
+        return Lexemes(
+            (dest, source if name == 'source' else match.group(name))
+            for name, dest in mapping.items()
+        )
+    lexemes = Lexemes((name, match.group(name)) for name in match.re.groupindex if name != exclude)
+    lexemes['source'] = source
+    return lexemes
 
 
 def strip_prefix(text: str, prefix: str) -> str:
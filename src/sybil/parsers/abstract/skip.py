@@ -1,5 +1,6 @@
 import re
 from collections.abc import Iterable, Sequence
+from typing import Optional, Tuple
 
 from sybil import Document, Region
 from sybil.evaluators.skip import Skipper
@@ -24,6 +25,10 @@ class AbstractSkipParser:
         self.lexers = LexerCollection(lexers)
         self.skipper = Skipper(self.directive)
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return self.lexers.markers
+
     def __call__(self, document: Document) -> Iterable[Region]:
         for lexed in self.lexers(document):
             arguments = lexed.lexemes['arguments']
@@ -1,9 +1,10 @@
 import re
+from bisect import bisect_left
 from collections.abc import Iterable
-from typing import Optional, Dict, Pattern, Match, List
+from typing import Optional, Dict, Pattern, Match, List, Tuple
 
-from sybil import Document, Region, Lexeme
-from sybil.parsers.abstract.lexers import BlockLexer, strip_prefix
+from sybil import Document, Region
+from sybil.parsers.abstract.lexers import BlockLexer, LazyLexeme, ScanningLexer, mapped_lexemes
 
 FENCE = re.compile(
     r"^(?P<prefix>"
@@ -15,7 +16,7 @@ FENCE = re.compile(
 )
 
 
-class RawFencedCodeBlockLexer:
+class RawFencedCodeBlockLexer(ScanningLexer):
     """
     A :class:`~sybil.typing.Lexer` for Markdown fenced code blocks allowing flexible lexing
     of the whole `info` line along with more complicated prefixes.
@@ -35,6 +36,9 @@ class RawFencedCodeBlockLexer:
 
     """
 
+    start_pattern = FENCE
+    markers = ('```', '~~~')
+
     def __init__(
         self,
         info_pattern: Pattern[str] = re.compile(r'$\n', re.MULTILINE),
@@ -66,25 +70,60 @@ class RawFencedCodeBlockLexer:
         info = self.info_pattern.match(content)
         if info is None:
             return None
-        lexemes = info.groupdict()
-        lexemes['source'] = Lexeme(
-            strip_prefix(content[info.end() :], opening.group('prefix')),
+        source = LazyLexeme(
+            document.text,
+            content_start + info.end(),
+            content_end,
+            opening.group('prefix'),
             offset=content_start - opening.start() + info.end(),
             line_offset=0,
         )
-        if self.mapping:
-            lexemes = {dest: lexemes[source] for source, dest in self.mapping.items()}
+        lexemes = mapped_lexemes(info, source, self.mapping)
         return Region(opening.start(), region_end, lexemes=lexemes)
 
-    def __call__(self, document: Document) -> Iterable[Region]:
+    def lex_matches(self, document: Document, matches: Iterable[Match[str]]) -> Iterable[Region]:
+        if type(self).match_closes_existing is not RawFencedCodeBlockLexer.match_closes_existing:
+            # A subclass may close blocks differently, so each open block must be checked:
+            yield from self.lex_matches_by_checking(document, matches)
+            return
         open_blocks: List[Match[str]] = []
-        index = 0
-        while True:
-            match = FENCE.search(document.text, index)
-            if match is None:
-                break
-            else:
-                index = match.end()
+        # For each fence character and prefix length, the positions in open_blocks of
+        # the blocks using them, along with the negated length of the shortest fence
+        # of those blocks up to and including each one:
+        keyed: Dict[Tuple[str, int], Tuple[List[int], List[int]]] = {}
+        for match in matches:
+            fence = match.group('fence')
+            key = fence[0], len(match.group('prefix'))
+            positions, shortest = keyed.setdefault(key, ([], []))
+            if positions and not match.group('trailing').strip():
+                # The outermost block with a fence no longer than this one is closed:
+                i = bisect_left(shortest, -len(fence))
+                if i < len(positions):
+                    position = positions[i]
+                    maybe_region = self.make_region(open_blocks[position], document, match)
+                    if maybe_region is not None:
+                        yield maybe_region
+                    for closed in reversed(open_blocks[position:]):
+                        closed_positions, closed_shortest = keyed[
+                            closed.group('fence')[0], len(closed.group('prefix'))
+                        ]
+                        closed_positions.pop()
+                        closed_shortest.pop()
+                    del open_blocks[position:]
+                    continue
+            positions.append(len(open_blocks))
+            shortest.append(max(shortest[-1], -len(fence)) if shortest else -len(fence))
+            open_blocks.append(match)
+        if open_blocks:
+            maybe_region = self.make_region(open_blocks[0], document, closing=None)
+            if maybe_region is not None:
+                yield maybe_region
+
+    def lex_matches_by_checking(
+        self, document: Document, matches: Iterable[Match[str]]
+    ) -> Iterable[Region]:
+        open_blocks: List[Match[str]] = []
+        for match in matches:
             # does this fence close any open block?
             for i in range(len(open_blocks)):
                 existing = open_blocks[i]
@@ -168,6 +207,8 @@ class DirectiveInHTMLCommentLexer(BlockLexer):
         Only mapped lexemes will be returned in any :class:`~sybil.Region` objects.
     """
 
+    markers = ('<!--',)
+
     def __init__(
         self, directive: str, arguments: str = '.*?', mapping: Optional[Dict[str, str]] = None
     ) -> None:
@@ -1,4 +1,5 @@
 from collections.abc import Iterable
+from typing import Optional, Tuple
 
 from sybil import Document, Region
 from sybil.evaluators.doctest import DocTestEvaluator
@@ -20,6 +21,10 @@ class DocTestDirectiveParser:
         self.lexer = DirectiveLexer('doctest')
         self.string_parser = DocTestStringParser(DocTestEvaluator(optionflags))
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return self.lexer.markers
+
     def __call__(self, document: Document) -> Iterable[Region]:
         for lexed_region in self.lexer(document):
             source = lexed_region.lexemes['source']
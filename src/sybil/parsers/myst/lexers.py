@@ -1,6 +1,5 @@
 import re
-from collections.abc import Iterable
-from typing import Optional, Dict
+from typing import Optional, Dict, Match
 
 from sybil import Document, Region
 from sybil.parsers.abstract.lexers import BlockLexer
@@ -69,11 +68,14 @@ class DirectiveLexer(RawFencedCodeBlockLexer):
             mapping=mapping,
         )
 
-    def __call__(self, document: Document) -> Iterable[Region]:
-        for lexed in super().__call__(document):
+    def make_region(
+        self, opening: Match[str], document: Document, closing: Optional[Match[str]]
+    ) -> Optional[Region]:
+        lexed = super().make_region(opening, document, closing)
+        if lexed is not None:
             parse_options_and_source(lexed)
             parse_yaml_options(lexed)
-            yield lexed
+        return lexed
 
 
 DIRECTIVE_IN_PERCENT_COMMENT_START = (
@@ -110,6 +112,8 @@ class DirectiveInPercentCommentLexer(BlockLexer):
         Only mapped lexemes will be returned in any :class:`~sybil.Region` objects.
     """
 
+    markers = ('%',)
+
     def __init__(
         self, directive: str, arguments: str = '.*', mapping: Optional[Dict[str, str]] = None
     ) -> None:
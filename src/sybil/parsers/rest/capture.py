@@ -1,7 +1,8 @@
 import re
 import string
+from bisect import bisect_right
 from collections.abc import Iterable
-from typing import List, Tuple
+from typing import List
 from textwrap import dedent
 
 from sybil import Region, Document
@@ -9,37 +10,36 @@ from sybil.evaluators.capture import evaluate_capture
 
 CAPTURE_DIRECTIVE = re.compile(r'^(?P<indent>(\t| )*)\.\.\s*-+>\s*(?P<name>\S+).*$')
 
+# The same as CAPTURE_DIRECTIVE, but for matching at the start of a line within the text:
+CAPTURE_DIRECTIVE_AT = re.compile(CAPTURE_DIRECTIVE.pattern[1:])
 
-def indent_matches(line: str, indent: str) -> bool:
-    # Is the indentation of a line match what we're looking for?
+# The characters other than newlines that str.splitlines() treats as line boundaries:
+OTHER_LINE_BREAKS = r'\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+OTHER_LINE_BREAK = re.compile(f'[{OTHER_LINE_BREAKS}]')
+LINE_BREAK = re.compile(rf'\r\n|[\n{OTHER_LINE_BREAKS}]')
+POSSIBLE_DIRECTIVE = re.compile(rf'(?:\A|(?<=[\n{OTHER_LINE_BREAKS}]))[\t ]*\.\.')
+POSSIBLE_DIRECTIVE_AFTER_NEWLINE = re.compile(r'^[\t ]*\.\.', re.MULTILINE)
 
-    if not line.strip():
-        # the line consists entirely of whitespace (or nothing at all),
-        # so is not considered to be of the appropriate indentation
-        return False
-
-    if line.startswith(indent):
-        if line[len(indent)] not in string.whitespace:
-            return True
-
-    # if none of the above found the indentation to be a match, it is
-    # not a match
-    return False
 
+def line_starts(text: str) -> List[int]:
+    """
+    Return the offsets at which each of the lines that :meth:`str.splitlines` would
+    return start in the supplied text.
+    """
+    starts = [0]
+    starts.extend(match.end() for match in LINE_BREAK.finditer(text))
+    return starts
 
-class DocumentReversedLines(List[str]):
-    def __init__(self, document: Document) -> None:
-        super().__init__()
-        self[:] = document.text.splitlines(keepends=True)
-        self.current_line = len(self)
-        self.current_line_end_position = len(document.text)
 
-    def iterate_with_line_number(self) -> Iterable[Tuple[int, str]]:
-        while self.current_line > 0:
-            self.current_line -= 1
-            line = self[self.current_line]
-            self.current_line_end_position -= len(line)
-            yield self.current_line, line
+def indent_matches(text: str, start: int, end: int, indent: str) -> bool:
+    # Does the line between start and end have exactly the indentation we're looking for?
+    if not text.startswith(indent, start, end):
+        return False
+    following = start + len(indent)
+    if following == end or text[following] in string.whitespace:
+        return False
+    # a line consisting entirely of whitespace is not of the appropriate indentation:
+    return not text[following].isspace() or bool(text[start:end].strip())
 
 
 class CaptureParser:
@@ -47,36 +47,50 @@ class CaptureParser:
     A :any:`Parser` for :ref:`captures <capture-parser>`.
     """
 
+    markers = ('..',)
+
     def __call__(self, document: Document) -> Iterable[Region]:
-        lines = DocumentReversedLines(document)
-
-        for end_index, line in lines.iterate_with_line_number():
-            directive = CAPTURE_DIRECTIVE.match(line)
-            if directive:
-                region_end = lines.current_line_end_position
-
-                indent = directive.group('indent')
-                for start_index, line in lines.iterate_with_line_number():
-                    if indent_matches(line, indent):
-                        # don't include the preceding line in the capture
-                        start_index += 1
-                        break
-                else:
-                    # make it blow up
-                    start_index = end_index
-
-                if end_index - start_index < 2:
-                    raise ValueError(
-                        ("couldn't find the start of the block to match %r on line %i of %s")
-                        % (directive.group(), end_index + 1, document.path)
-                    )
-
-                # after dedenting, we need to remove excess leading and trailing
-                # newlines, before adding back the final newline that's strippped
-                # off
-                text = dedent(''.join(lines[start_index:end_index])).strip() + '\n'
-
-                name = directive.group('name')
-                parsed = name, text
-
-                yield Region(lines.current_line_end_position, region_end, parsed, evaluate_capture)
+        text = document.text
+        if OTHER_LINE_BREAK.search(text) is None:
+            # The usual case, where the document's own index of lines can be used:
+            starts = document.line_offsets.offsets
+            possible = POSSIBLE_DIRECTIVE_AFTER_NEWLINE.finditer(text)
+        else:
+            starts = line_starts(text)
+            possible = POSSIBLE_DIRECTIVE.finditer(text)
+
+        def line_end(index: int) -> int:
+            return starts[index + 1] if index + 1 < len(starts) else len(text)
+
+        # Lines at or after this one have already been captured or searched:
+        limit = len(starts)
+        for position in reversed([match.start() for match in possible]):
+            end_index = bisect_right(starts, position) - 1
+            if end_index >= limit:
+                continue
+            directive = CAPTURE_DIRECTIVE_AT.match(text, position, line_end(end_index))
+            if directive is None:
+                continue
+
+            indent = directive.group('indent')
+            start_index = end_index - 1
+            while start_index >= 0 and not indent_matches(
+                text, starts[start_index], line_end(start_index), indent
+            ):
+                start_index -= 1
+            if start_index < 0 or end_index - start_index < 3:
+                raise ValueError(
+                    ("couldn't find the start of the block to match %r on line %i of %s")
+                    % (directive.group(), end_index + 1, document.path)
+                )
+            limit = start_index
+
+            # after dedenting, we need to remove excess leading and trailing
+            # newlines, before adding back the final newline that's strippped
+            # off, not including the preceding line in the capture
+            captured = dedent(text[starts[start_index + 1] : starts[end_index]]).strip() + '\n'
+
+            name = directive.group('name')
+            parsed = name, captured
+
+            yield Region(starts[start_index], starts[end_index], parsed, evaluate_capture)
@@ -1,4 +1,5 @@
 from collections.abc import Iterable
+from typing import Optional, Tuple
 
 from sybil import Document, Region
 from sybil.evaluators.doctest import DocTestEvaluator
@@ -16,6 +17,8 @@ class DocTestParser:
 
     """
 
+    markers = ('>>>',)
+
     def __init__(self, optionflags: int = 0) -> None:
         self.string_parser = DocTestStringParser(DocTestEvaluator(optionflags))
 
@@ -37,6 +40,10 @@ class DocTestDirectiveParser:
         self.lexer = DirectiveLexer(directive='doctest')
         self.string_parser = DocTestStringParser(DocTestEvaluator(optionflags))
 
+    @property
+    def markers(self) -> Optional[Tuple[str, ...]]:
+        return self.lexer.markers
+
     def __call__(self, document: Document) -> Iterable[Region]:
         for lexed in self.lexer(document):
             source = lexed.lexemes['source']
@@ -1,6 +1,5 @@
 import re
-from collections.abc import Iterable
-from typing import Optional, Dict
+from typing import Optional, Dict, Match
 
 from sybil import Document, Region
 from sybil.parsers.abstract.lexers import BlockLexer
@@ -23,8 +22,9 @@ def parse_options_and_source(lexed: Region) -> None:
     if raw_options:
         for match in OPTIONS_PATTERN.finditer(raw_options):
             options[match['name']] = match['value']
-    source = lexemes.get('source')
-    if source:
+    # Looked up directly so that a lazy source isn't extracted just to be stripped:
+    source = dict.get(lexemes, 'source')
+    if source is not None:
         lexemes['source'] = source.strip_leading_newlines()
 
 
@@ -49,6 +49,7 @@ class DirectiveLexer(BlockLexer):
     """
 
     delimiter = '::'
+    markers = ('..',)
 
     def __init__(
         self,
@@ -71,10 +72,10 @@ class DirectiveLexer(BlockLexer):
             mapping=mapping,
         )
 
-    def __call__(self, document: Document) -> Iterable[Region]:
-        for lexed in super().__call__(document):
-            parse_options_and_source(lexed)
-            yield lexed
+    def make_region(self, start_match: Match[str], document: Document) -> Region:
+        lexed = super().make_region(start_match, document)
+        parse_options_and_source(lexed)
+        return lexed
 
 
 class DirectiveInCommentLexer(DirectiveLexer):
@@ -0,0 +1,114 @@
+import os
+import re
+from collections.abc import Callable, Iterable, Iterator
+from fnmatch import translate
+from pathlib import Path, PurePath
+from typing import List, Optional
+
+TRANSLATED = re.compile(r'\(\?s:(.*)\)\\[Zz]', re.DOTALL)
+
+
+def translate_part(part: str) -> str:
+    """
+    Translate one part of a glob pattern into a regular expression that matches the
+    same text as :func:`fnmatch.fnmatch` but never matches across a ``/``.
+    """
+    parts: List[str] = []
+    i, n = 0, len(part)
+    while i < n:
+        c = part[i]
+        i += 1
+        if c == '*':
+            if not parts or parts[-1] != '[^/]*':
+                parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            # Find the end of the set in the same way as fnmatch:
+            j = i
+            if j < n and part[j] == '!':
+                j += 1
+            if j < n and part[j] == ']':
+                j += 1
+            while j < n and part[j] != ']':
+                j += 1
+            if j >= n:
+                parts.append(re.escape(c))
+            else:
+                translated = TRANSLATED.fullmatch(translate(part[i - 1 : j + 1]))
+                assert translated is not None, 'fnmatch.translate has changed'
+                parts.append(f'(?:(?!/){translated.group(1)})')
+                i = j + 1
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
+
+
+def translate_pattern(pattern: str) -> Optional[str]:
+    """
+    Translate a pattern, as passed to :meth:`pathlib.PurePath.match`, into a regular
+    expression that can be searched for in a relative path that uses ``/`` as its separator.
+    The expression must be followed by one that anchors where the match ends.
+    ``None`` is returned for absolute patterns, which can never match a relative path.
+    """
+    path = PurePath(pattern)
+    if not path.parts:
+        raise ValueError('empty pattern')
+    if path.anchor:
+        return None
+    return '(?:^|/)' + '/'.join(translate_part(part) for part in path.parts)
+
+
+class PathMatcher:
+    """
+    Match relative paths against a collection of patterns in a single regular expression
+    search, giving the same results as calling :meth:`pathlib.PurePath.match` with each
+    pattern in turn.
+
+    :param patterns:
+        The patterns to match. Relative patterns match from the right.
+
+    :param directories:
+        If ``True``, a path also matches if any of the directories containing it matches.
+    """
+
+    def __init__(self, patterns: Iterable[str], directories: bool = False) -> None:
+        translated = [translate_pattern(pattern) for pattern in patterns]
+        alternatives = [regex for regex in translated if regex is not None]
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        end = r'(?:/|\Z)' if directories else r'\Z'
+        self.regex = (
+            re.compile(f'(?:{"|".join(alternatives)}){end}', flags) if alternatives else None
+        )
+
+    def __call__(self, relative_path: str) -> bool:
+        """
+        Return ``True`` if the supplied relative path, which must use ``/`` as its
+        separator, matches any of the patterns.
+        """
+        return self.regex is not None and self.regex.search(relative_path) is not None
+
+
+def walk_files(directory: Path, skip: Optional[Callable[[Path], bool]] = None) -> Iterator[Path]:
+    """
+    Yield the paths of files in the supplied directory and its subdirectories, in the
+    same order and following the same rules as filtering ``sorted(directory.glob('**/*'))``
+    with :meth:`~pathlib.Path.is_file`, but using :func:`os.scandir` so that
+    no further system calls are needed for most entries.
+
+    If ``skip`` is supplied, it is called with the path of each subdirectory found and
+    those for which it returns ``True`` are not searched.
+    """
+    try:
+        with os.scandir(directory) as scanned:
+            entries = sorted(scanned, key=lambda entry: os.path.normcase(entry.name))
+    except OSError:
+        return
+    for entry in entries:
+        path = directory / entry.name
+        # Symbolic links to directories are not followed, but those to files are used:
+        if entry.is_dir(follow_symlinks=False):
+            if skip is None or not skip(path):
+                yield from walk_files(path, skip)
+        elif entry.is_file():
+            yield path
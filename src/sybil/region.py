@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 from sybil.typing import Evaluator, LexemeMapping
 
@@ -10,14 +10,28 @@ class Lexeme(str):
     that contains it.
     """
 
+    # str subclasses can't have slots, but only the offsets need storing:
+    offset: int
+    line_offset: int
+
     def __new__(cls, text: str, offset: int, line_offset: int) -> 'Lexeme':
         return str.__new__(cls, text)
 
     def __init__(self, text: str, offset: int, line_offset: int) -> None:
-        self.text = text
         self.offset = offset
         self.line_offset = line_offset
 
+    @property
+    def text(self) -> str:
+        """
+        The text of this lexeme as a plain :class:`str`.
+        """
+        return str(self)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # str's own pickling support would lose the offsets:
+        return Lexeme, (self.text, self.offset, self.line_offset)
+
     def strip_leading_newlines(self) -> 'Lexeme':
         stripped = self.lstrip('\n')
         removed = len(self) - len(stripped)
@@ -49,6 +63,8 @@ class Region:
         as it should be.
     """
 
+    __slots__ = ('start', 'end', 'parsed', 'evaluator', 'lexemes')
+
     def __init__(
         self,
         start: int,
@@ -1,10 +1,13 @@
 import inspect
+import os
 from pathlib import Path
 from collections.abc import Callable, Collection, Mapping, Sequence
 from typing import Any, Dict, Optional, Type, List, Tuple
 
+from .cache import CodeCache, ParseCache, precompile
 from .document import Document, PythonDocStringDocument
 from .example import Example
+from .paths import PathMatcher
 from .typing import Parser
 
 DEFAULT_DOCUMENT_TYPES = {
@@ -40,11 +43,14 @@ class Sybil:
 
     :param exclude:
       An optional :func:`pattern <fnmatch.fnmatch>` for source file names
-      that will be excluded when looking for examples.
+      that will be excluded when looking for examples. Directories matching it are
+      excluded along with everything in them.
 
     :param excludes:
       An optional  sequence of :func:`patterns <fnmatch.fnmatch>` for source paths
-      that will be excluded when looking for examples.
+      that will be excluded when looking for examples. Directories matching any of them
+      are excluded along with everything in them, and are not searched when using
+      :ref:`unittest <unitttest_integration>`.
 
     :param filenames:
       An optional collection of file names that, if found anywhere within the
@@ -78,6 +84,55 @@ class Sybil:
     :param name:
       A name to use in test identifiers so that the identifier indicates which :class:`Sybil`
       that test was discovered by.
+
+    :param cache_dir:
+      An optional path to a directory in which the results of parsing documentation source
+      files will be cached between runs, relative to the path of the Python source file in which
+      this class is instantiated. Absolute paths can also be passed.
+      Cached results are only used when both the source file and the configuration of the
+      parsers are unchanged. Compiled code for Python examples is also stored here, along
+      with a manifest of the examples in each file so that, when using
+      :ref:`pytest <pytest_integration>`, files that have not changed since they were last
+      collected are only parsed if their examples are run.
+      Compiled code for doctests is not, as :mod:`doctest` compiles them itself and
+      provides no way to supply compiled code.
+      The directory should only be writable by trusted users.
+
+    :param precompile:
+      If ``True``, the Python examples in each documentation source file will be compiled in
+      a background thread once the file has been parsed, so that compiled code is ready by
+      the time the examples are evaluated. Doctests are not precompiled, for the same reason
+      they are not cached. Any problems found, such as syntax errors, are reported when the
+      example they are in is evaluated. The background threads are stopped once the tests
+      have been run.
+
+    :param fork:
+      If ``True``, the examples from each documentation source file will be evaluated in a
+      child process forked from the test runner's process once ``setup`` has been called,
+      and fixtures have been inserted, for that file. Each file's examples start with a copy
+      of anything imported or set up so far but cannot affect other files.
+      The ``teardown`` callable is called in the test runner's process and so will not see
+      any changes made to the namespace by the examples.
+      As the child process is forked when the first example from a file runs, ``fixtures``
+      cannot be function-scoped. This cannot be used with ``precompile``, including by
+      another :class:`Sybil` used alongside this one. Only available where :func:`os.fork` is.
+
+    :param split_at_clear_namespace:
+      When `pytest-xdist`__ is in use, the examples from each documentation source file are
+      placed in the same ``xdist_group`` so that ``--dist loadgroup`` runs them in order on one
+      worker. If this is ``True``, each :ref:`clear-namespace <clear-namespace>` instruction
+      that isn't skipped starts a new group, allowing the parts of a file to run on different
+      workers.
+
+      __ https://pytest-xdist.readthedocs.io
+
+    :param skip_unchanged:
+      If ``True``, when using :ref:`pytest <pytest_integration>`, documentation source files
+      where every example passed are recorded in the ``cache_dir`` along with the source files
+      of any modules imported by then that are not part of the standard library or installed
+      in site-packages. On later runs, the examples in such files are skipped if neither the
+      file nor any of those modules have changed. This requires a ``cache_dir`` and cannot be
+      used with ``fork``, as modules imported by forked processes cannot be seen.
     """
 
     def __init__(
@@ -95,14 +150,19 @@ class Sybil:
         encoding: str = 'utf-8',
         document_types: Optional[Mapping[Optional[str], Type[Document]]] = None,
         name: str = '',
+        cache_dir: Optional[str] = None,
+        precompile: bool = False,
+        fork: bool = False,
+        split_at_clear_namespace: bool = False,
+        skip_unchanged: bool = False,
     ) -> None:
         self.parsers: Sequence[Parser] = parsers
         current_frame = inspect.currentframe()
         calling_frame = current_frame.f_back
         assert calling_frame is not None, 'Cannot find previous frame, which is weird...'
         calling_filename = inspect.getframeinfo(calling_frame).filename
-        start_path = Path(calling_filename).parent / path
-        self.path: Path = start_path.absolute()
+        calling_path = Path(calling_filename).parent
+        self.path: Path = (calling_path / path).absolute()
         self.patterns = list(patterns)
         if pattern:
             self.patterns.append(pattern)
@@ -110,6 +170,9 @@ class Sybil:
         if exclude:
             self.excludes.append(exclude)
         self.filenames = filenames
+        self.include_matcher = PathMatcher(self.patterns)
+        self.exclude_matcher = PathMatcher(self.excludes, directories=True)
+        self.path_prefix = os.path.join(self.path, '')
         self.setup: Optional[Callable[[Dict[str, Any]], None]] = setup
         self.teardown: Optional[Callable[[Dict[str, Any]], None]] = teardown
         self.fixtures: Tuple[str, ...] = tuple(fixtures)
@@ -119,6 +182,22 @@ class Sybil:
             self.document_types.update(document_types)
         self.default_document_type: Type[Document] = self.document_types[None]
         self.name = name
+        self.cache: Optional[ParseCache] = None
+        if cache_dir is not None:
+            self.cache = ParseCache((calling_path / cache_dir).absolute(), parsers)
+        self.precompile = precompile
+        if fork and not hasattr(os, 'fork'):
+            raise ValueError('fork=True requires os.fork(), which is not available')
+        if fork and precompile:
+            # Forking a process while the precompile thread is running isn't safe:
+            raise ValueError('precompile=True cannot be used with fork=True')
+        self.fork = fork
+        self.split_at_clear_namespace = split_at_clear_namespace
+        if skip_unchanged and cache_dir is None:
+            raise ValueError('skip_unchanged=True requires a cache_dir')
+        if skip_unchanged and fork:
+            raise ValueError('skip_unchanged=True cannot be used with fork=True')
+        self.skip_unchanged = skip_unchanged
 
     def __repr__(self) -> str:
         return f'<Sybil: {self.name or str(id(self))}>'
@@ -130,27 +209,39 @@ class Sybil:
         assert isinstance(other, Sybil)
         return SybilCollection((self, other))
 
+    def relative_path(self, path: Path) -> Optional[str]:
+        # This is equivalent to Path.relative_to for the absolute paths used here, but faster:
+        text = str(path)
+        if not text.startswith(self.path_prefix):
+            return None
+        relative = text[len(self.path_prefix) :]
+        return relative if os.sep == '/' else relative.replace(os.sep, '/')
+
     def should_parse(self, path: Path) -> bool:
-        try:
-            path = path.relative_to(self.path)
-        except ValueError:
+        relative = self.relative_path(path)
+        if not relative:
             return False
-
-        include = False
-        if any(path.match(p) for p in self.patterns):
-            include = True
-        if path.name in self.filenames:
-            include = True
-        if not include:
+        if not (self.include_matcher(relative) or path.name in self.filenames):
             return False
+        return not self.exclude_matcher(relative)
 
-        if any(path.match(e) for e in self.excludes):
-            return False
-        return True
+    def should_search(self, directory: Path) -> bool:
+        relative = self.relative_path(directory)
+        return not (relative and self.exclude_matcher(relative))
+
+    def document_type(self, path: Path) -> Type[Document]:
+        return self.document_types.get(path.suffix, self.default_document_type)
 
     def parse(self, path: Path) -> Document:
-        type_ = self.document_types.get(path.suffix, self.default_document_type)
-        return type_.parse(str(path), *self.parsers, encoding=self.encoding)
+        type_ = self.document_type(path)
+        if self.cache is not None:
+            document = self.cache.parse(type_, path, self.encoding)
+        else:
+            document = type_.parse(str(path), *self.parsers, encoding=self.encoding)
+        document.code_cache = CodeCache(None if self.cache is None else self.cache.path)
+        if self.precompile:
+            precompile(document)
+        return document
 
     def identify(self, example: Example) -> str:
         sybil_name = f'sybil:{self.name},' if self.name else ''
@@ -173,6 +264,15 @@ class Sybil:
         return unittest_integration(self)
 
 
+def check_compatible(sybils: Sequence[Sybil]) -> None:
+    """
+    Check that the supplied :class:`Sybil` instances can be used in the same test run.
+    """
+    if any(sybil.fork for sybil in sybils) and any(sybil.precompile for sybil in sybils):
+        # The precompile thread of one would be running when another forks:
+        raise ValueError('precompile=True cannot be used with fork=True')
+
+
 class SybilCollection(List[Sybil]):
     """
     When :class:`Sybil` instances are concatenated, the collection returned can
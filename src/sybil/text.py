@@ -1,17 +1,46 @@
 import re
+from bisect import bisect
+from collections.abc import Iterable
+from typing import Any, List, Optional, Tuple
 
 NEWLINE = re.compile("\n")
 
 
 class LineNumberOffsets:
+    """
+    An index of the character offsets at which each line of some text starts, allowing
+    conversion between positions and line numbers without re-scanning the text.
+    """
+
     def __init__(self, text: str) -> None:
-        self.offsets = {
-            line: match.start() + 1 for (line, match) in enumerate(NEWLINE.finditer(text), start=1)
-        }
-        self.offsets[0] = 0
+        self.offsets: List[int] = [0]
+        self.offsets.extend(match.end() for match in NEWLINE.finditer(text))
 
     def get(self, line: int, column: int) -> int:
         """
         Return the character offset of the  zero based line number and column offset.
         """
         return self.offsets[line] + column
+
+    def line_column(self, position: int) -> Tuple[int, int]:
+        """
+        Return the one based line number and column of the supplied character offset.
+        """
+        # positions before the start of the text are treated as being on the first line:
+        line = max(bisect(self.offsets, position), 1)
+        return line, position - self.offsets[line - 1] + 1
+
+
+def combined_markers(objects: Iterable[Any]) -> Optional[Tuple[str, ...]]:
+    """
+    Return all the ``markers`` of the supplied :term:`parsers <Parser>` or
+    :term:`lexers <Lexer>`, or ``None`` if any of them doesn't specify its markers, meaning
+    it may find something in any text.
+    """
+    markers: List[str] = []
+    for obj in objects:
+        obj_markers = getattr(obj, 'markers', None)
+        if obj_markers is None:
+            return None
+        markers.extend(marker for marker in obj_markers if marker not in markers)
+    return tuple(markers)
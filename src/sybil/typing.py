@@ -14,6 +14,9 @@ Evaluator = Callable[['sybil.Example'], Optional[str]]
 Lexer = Callable[['sybil.Document'], Iterable['sybil.Region']]
 
 #: The signature for a :term:`parser`.
+#: Parsers may also have a ``markers`` attribute containing a sequence of strings, at least one
+#: of which must be present in any text they can find examples in. This allows text containing
+#: none of them to be skipped without being parsed.
 Parser = Callable[['sybil.Document'], Iterable['sybil.Region']]
 
 # This could likely be a TypedDict.
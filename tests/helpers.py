@@ -1,4 +1,5 @@
 import ast
+import os
 import sys
 from collections.abc import Sequence, Iterable
 from contextlib import contextmanager
@@ -10,6 +11,7 @@ from traceback import TracebackException
 from typing import Optional, Tuple, List, Union
 from unittest import TextTestRunner, main as unittest_main, SkipTest
 
+import pytest
 from pytest import CaptureFixture, ExceptionInfo, main as pytest_main
 from seedir import seedir
 from testfixtures import compare
@@ -25,6 +27,8 @@ HERE = Path(__file__).parent
 DOCS = HERE.parent / 'docs'
 SAMPLE_PATH = HERE / 'samples'
 
+needs_fork = pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork() is not available')
+
 
 def sample_path(name) -> str:
     return str(SAMPLE_PATH / name)
@@ -188,14 +192,14 @@ def clone_functional_sample(name: str, target: Path) -> Path:
     return dest
 
 
-def run_pytest(capsys: CaptureFixture[str], path: Path) -> Results:
+def run_pytest(capsys: CaptureFixture[str], path: Path, *args: str) -> Results:
     class CollectResults:
         def pytest_sessionfinish(self, session):
             self.session = session
 
     results = CollectResults()
     return_code = pytest_main(
-        ['-vvs', '--color=no', str(path), '-p', 'no:doctest'], plugins=[results]
+        ['-vvs', '--color=no', str(path), '-p', 'no:doctest', *args], plugins=[results]
     )
     return Results(
         capsys,
@@ -0,0 +1,639 @@
+import os
+import pickle
+import time
+import traceback
+from pathlib import Path
+from shutil import copy
+from threading import Timer
+from typing import List
+from unittest import SkipTest
+
+import pytest
+from testfixtures import Replacer, ShouldRaise, compare
+from testfixtures.mock import Mock
+
+from sybil import Sybil, Document, Region, cache
+from sybil.cache import (
+    CodeCache,
+    ParseCache,
+    ParserGraph,
+    file_hash,
+    precompile,
+    project_module_files,
+    shutdown_precompile,
+    source_hash,
+)
+from sybil.document import PythonDocStringDocument
+from sybil.parsers.rest import CaptureParser, DocTestParser, PythonCodeBlockParser, SkipParser
+from .helpers import sample_path
+
+
+class CountingParser:
+    def __init__(self, parser) -> None:
+        self.parser = parser
+        self.calls: List[str] = []
+
+    def __call__(self, document: Document):
+        self.calls.append(document.path)
+        return self.parser(document)
+
+
+def make_sybil(cache_dir: Path, *parsers) -> Sybil:
+    return Sybil(list(parsers), cache_dir=str(cache_dir))
+
+
+def summary(document: Document):
+    return [(e.line, e.column, e.region.evaluator, e.parsed) for e in document]
+
+
+def test_hit_does_not_parse(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    copy(sample_path('codeblock.txt'), source)
+    parser = CountingParser(PythonCodeBlockParser())
+    sybil = make_sybil(tmp_path / 'cache', parser)
+
+    first = sybil.parse(source)
+    compare(parser.calls, expected=[str(source)])
+    second = sybil.parse(source)
+    compare(parser.calls, expected=[str(source)])
+
+    assert type(second) is Document
+    compare(second.text, expected=first.text)
+    compare(summary(second), expected=summary(first))
+    # evaluators are the ones from the configured parsers, not copies:
+    assert second.regions[0][1].evaluator is parser.parser._evaluator
+
+
+def test_hit_across_sybils(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    copy(sample_path('skip.txt'), source)
+    cache_dir = tmp_path / 'cache'
+    first = make_sybil(
+        cache_dir, CountingParser(SkipParser()), CountingParser(PythonCodeBlockParser())
+    ).parse(source)
+
+    skip_parser = CountingParser(SkipParser())
+    code_parser = CountingParser(PythonCodeBlockParser())
+    second = make_sybil(cache_dir, skip_parser, code_parser).parse(source)
+    compare(skip_parser.calls + code_parser.calls, expected=[])
+    compare(len(second.regions), expected=len(first.regions))
+    evaluators = {region.evaluator for _, region in second.regions}
+    compare(evaluators, expected={skip_parser.parser.skipper, code_parser.parser._evaluator})
+    for example in second:
+        try:
+            example.evaluate()
+        except SkipTest:
+            pass
+    compare(second.namespace['run'], expected=[2, 5])
+
+
+def test_text_changed(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    parser = CountingParser(DocTestParser())
+    sybil = make_sybil(tmp_path / 'cache', parser)
+    sybil.parse(source)
+    source.write_text('>>> 1\n1\n\n>>> 2\n2\n')
+    document = sybil.parse(source)
+    compare(len(parser.calls), expected=2)
+    compare(len(document.regions), expected=2)
+
+
+def test_parser_configuration_changed(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache_dir = tmp_path / 'cache'
+    make_sybil(cache_dir, DocTestParser()).parse(source)
+    parser = CountingParser(DocTestParser(optionflags=1))
+    make_sybil(cache_dir, parser).parse(source)
+    compare(len(parser.calls), expected=1)
+
+
+def test_fingerprint_stable():
+    compare(
+        ParserGraph([DocTestParser(), CaptureParser()]).fingerprint,
+        expected=ParserGraph([DocTestParser(), CaptureParser()]).fingerprint,
+    )
+    assert (
+        ParserGraph([DocTestParser()]).fingerprint
+        != ParserGraph([DocTestParser(optionflags=1)]).fingerprint
+    )
+
+
+def test_fingerprint_taken_when_built(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache_dir = tmp_path / 'cache'
+    parser = CountingParser(DocTestParser())
+    sybil = make_sybil(cache_dir, parser)
+    # State that parsers build up once in use, such as that of a Skipper, is ignored:
+    parser.calls.append('earlier document')
+    sybil.parse(source)
+    other = CountingParser(DocTestParser())
+    make_sybil(cache_dir, other).parse(source)
+    compare(other.calls, expected=[])
+
+
+class Slotted:
+    __slots__ = ('x', 'unset')
+
+    def __init__(self, x: int) -> None:
+        self.x = x
+
+
+class SlottedChild(Slotted):
+    __slots__ = 'y'
+
+    def __init__(self, x: int, y: int) -> None:
+        super().__init__(x)
+        self.y = y
+
+
+def test_fingerprint_slots():
+    compare(
+        ParserGraph([SlottedChild(1, 2)]).description,
+        expected='builtins.list[tests.test_cache.SlottedChild(x=1, y=2)]',
+    )
+    assert ParserGraph([Slotted(1)]).fingerprint != ParserGraph([Slotted(2)]).fingerprint
+
+
+def test_python_docstrings(tmp_path: Path):
+    source = tmp_path / 'docstrings.py'
+    copy(sample_path('docstrings.py'), source)
+    parser = CountingParser(DocTestParser())
+    sybil = make_sybil(tmp_path / 'cache', parser)
+    first = sybil.parse(source)
+    calls = len(parser.calls)
+    second = sybil.parse(source)
+    compare(len(parser.calls), expected=calls)
+    assert type(second) is PythonDocStringDocument
+    compare(
+        [(e.line, e.parsed.source) for e in second],
+        expected=[(e.line, e.parsed.source) for e in first],
+    )
+    # the module import evaluator is still in place:
+    compare(second.evaluators, expected=[second.import_document])
+
+
+def test_unpicklable_regions_not_cached(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('x')
+    calls = []
+
+    def parser(document):
+        calls.append(document.path)
+        yield Region(0, 1, None, lambda example: None)
+
+    sybil = make_sybil(tmp_path / 'cache', parser)
+    sybil.parse(source)
+    document = sybil.parse(source)
+    compare(len(calls), expected=2)
+    compare(len(document.regions), expected=1)
+    compare(list((tmp_path / 'cache' / 'regions').iterdir()), expected=[])
+
+
+def test_corrupt_entry(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    parser = CountingParser(DocTestParser())
+    sybil = make_sybil(tmp_path / 'cache', parser)
+    sybil.parse(source)
+    (entry,) = (tmp_path / 'cache' / 'regions').iterdir()
+    entry.write_bytes(b'garbage')
+    document = sybil.parse(source)
+    compare(len(parser.calls), expected=2)
+    compare(len(document.regions), expected=1)
+    # and the entry is replaced:
+    sybil.parse(source)
+    compare(len(parser.calls), expected=2)
+
+
+def test_missing_reference(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache = ParseCache(tmp_path, [DocTestParser()])
+    document = cache.parse(Document, source, 'utf-8')
+    key = cache.key(Document, str(source), document.text)
+    other = ParseCache(tmp_path, [])
+    other.graph.fingerprint = cache.graph.fingerprint
+    assert other.load(key) is None
+
+
+def test_lexeme_pickling():
+    from sybil import Lexeme
+
+    lexeme = pickle.loads(pickle.dumps(Lexeme('foo', offset=1, line_offset=2)))
+    assert type(lexeme) is Lexeme
+    compare(lexeme, expected='foo')
+    compare((lexeme.offset, lexeme.line_offset), expected=(1, 2))
+
+
+def test_relative_cache_dir():
+    sybil = Sybil([], cache_dir='.cache')
+    compare(sybil.cache.path, expected=Path(__file__).parent / '.cache')
+
+
+class Configured:
+    def __init__(self, **attrs) -> None:
+        self.__dict__.update(attrs)
+
+    def method(self) -> None:
+        pass
+
+
+def test_graph_description():
+    shared = Configured(x=1)
+    parser = Configured(
+        evaluator=shared.method,
+        shared=shared,
+        names={'b', 'a'},
+        mapping={'key': Configured()},
+    )
+    graph = ParserGraph([parser])
+    compare(
+        graph.description,
+        expected=(
+            'builtins.list[tests.test_cache.Configured('
+            'evaluator=tests.test_cache.Configured(x=1).method, '
+            "mapping=builtins.dict{'key': tests.test_cache.Configured}, "
+            "names=builtins.set{'a', 'b'}, "
+            'shared=<parsers[0].evaluator.__self__>)]'
+        ),
+    )
+    assert graph.objects['parsers[0].evaluator.__self__'] is shared
+    assert graph.persistent_id(shared) == 'parsers[0].evaluator.__self__'
+    assert graph.persistent_id(Configured()) is None
+
+
+def test_source_hash_missing_file(tmp_path: Path):
+    compare(source_hash(str(tmp_path / 'missing.py')), expected=b'')
+
+
+def compile_counter(source: str, calls: List[str]):
+    def compile_():
+        calls.append(source)
+        return compile(source, 'test.txt', 'exec')
+
+    return compile_
+
+
+def test_code_cache_in_memory():
+    cache = CodeCache()
+    calls: List[str] = []
+    code = cache.get(('key',), compile_counter('x = 1', calls))
+    assert cache.get(('key',), compile_counter('x = 1', calls)) is code
+    compare(calls, expected=['x = 1'])
+
+
+def test_code_cache_on_disk(tmp_path: Path):
+    calls: List[str] = []
+    cache = CodeCache(tmp_path)
+    cache.get(('key',), compile_counter('x = 1', calls))
+    other = CodeCache(tmp_path)
+    namespace: dict = {}
+    code = other.get(('key',), compile_counter('x = 1', calls))
+    assert code is not None
+    exec(code, namespace)
+    compare(calls, expected=['x = 1'])
+    compare(namespace['x'], expected=1)
+
+
+def test_code_cache_corrupt_entry(tmp_path: Path):
+    calls: List[str] = []
+    cache = CodeCache(tmp_path)
+    cache.get(('key',), compile_counter('x = 1', calls))
+    (entry,) = (tmp_path / 'code').glob('*/*.marshal')
+    entry.write_bytes(b'garbage')
+    other = CodeCache(tmp_path)
+    other.get(('key',), compile_counter('x = 1', calls))
+    compare(calls, expected=['x = 1', 'x = 1'])
+    # a valid marshal of something that isn't code is also a miss:
+    entry.write_bytes(b'N')
+    other.codes.clear()
+    other.get(('key',), compile_counter('x = 1', calls))
+    compare(len(calls), expected=3)
+
+
+def test_code_cache_none_not_cached(tmp_path: Path):
+    calls: List[str] = []
+
+    def compile_():
+        calls.append('compile')
+        return None
+
+    cache = CodeCache(tmp_path)
+    compare(cache.get(('key',), compile_), expected=None)
+    compare(cache.get(('key',), compile_), expected=None)
+    compare(calls, expected=['compile', 'compile'])
+    compare(cache.codes, expected={})
+    assert not (tmp_path / 'code').exists()
+
+
+def test_code_cache_cannot_store(tmp_path: Path):
+    # Something in the way of the directory entries are stored in:
+    (tmp_path / 'code').write_text('')
+    calls: List[str] = []
+    cache = CodeCache(tmp_path)
+    code = cache.get(('key',), compile_counter('x = 1', calls))
+    assert cache.get(('key',), compile_counter('x = 1', calls)) is code
+    compare(calls, expected=['x = 1'])
+
+
+def test_parse_cache_cannot_store(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    for name in 'regions', 'manifests':
+        (cache_dir / name).write_text('')
+    cache = ParseCache(cache_dir, [DocTestParser()])
+    document = cache.parse(Document, source, 'utf-8')
+    compare([e.parsed.source for e in document], expected=['1\n'])
+    cache.store_manifest(Document, source, '', source.stat(), [])
+    compare(cache.load_manifest(Document, source, ''), expected=None)
+
+
+def test_code_cache_used_by_evaluators(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> x = 1\n\n.. code-block:: python\n\n  y = x + 1\n')
+    document = Sybil([DocTestParser(), PythonCodeBlockParser()]).parse(source)
+    for example in document:
+        example.evaluate()
+    compare(document.namespace['y'], expected=2)
+    assert document.code_cache is not None
+    compare(
+        list(document.code_cache.codes),
+        expected=[('exec', 'y = x + 1', str(source), 0)],
+    )
+
+
+def test_no_code_cache(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('.. code-block:: python\n\n  y = 1\n')
+    document = Document.parse(str(source), PythonCodeBlockParser())
+    compare(document.code_cache, expected=None)
+    for example in document:
+        example.evaluate()
+    compare(document.namespace['y'], expected=1)
+
+
+def error_line(document: Document) -> int:
+    (example,) = document
+    with ShouldRaise(ValueError) as s:
+        example.evaluate()
+    assert s.raised.__traceback__ is not None
+    return traceback.extract_tb(s.raised.__traceback__)[-1].lineno
+
+
+def test_code_cache_reused_when_lines_move(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    example = '.. code-block:: python\n\n  x = 1\n  raise ValueError(x)\n'
+    source.write_text(example)
+    compare(
+        error_line(make_sybil(tmp_path / 'cache', PythonCodeBlockParser()).parse(source)),
+        expected=4,
+    )
+    source.write_text('Some text.\n\n' + example)
+    compare(
+        error_line(make_sybil(tmp_path / 'cache', PythonCodeBlockParser()).parse(source)),
+        expected=6,
+    )
+    compare(len(list((tmp_path / 'cache' / 'code').glob('*/*.marshal'))), expected=1)
+
+
+def test_code_cache_syntax_error_not_cached(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('.. code-block:: python\n\n  x = (\n')
+    document = Sybil([PythonCodeBlockParser()]).parse(source)
+    (example,) = document
+    for _ in range(2):
+        with ShouldRaise(SyntaxError) as s:
+            example.evaluate()
+        compare(s.raised.lineno, expected=3)
+    assert document.code_cache is not None
+    compare(document.code_cache.codes, expected={})
+
+
+def test_code_cache_dir(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    document = make_sybil(tmp_path / 'cache', DocTestParser()).parse(source)
+    assert document.code_cache is not None
+    compare(document.code_cache.path, expected=tmp_path / 'cache')
+    document = Sybil([DocTestParser()]).parse(source)
+    assert document.code_cache is not None
+    compare(document.code_cache.path, expected=None)
+
+
+def test_precompile(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text(
+        '>>> x = 1\n'
+        '\n'
+        '.. code-block:: python\n'
+        '\n'
+        '  y = x + 1\n'
+        '\n'
+        '.. skip: next\n'
+        '\n'
+        '.. code-block:: python\n'
+        '\n'
+        '  z = (\n'
+    )
+    document = Sybil([DocTestParser(), PythonCodeBlockParser(), SkipParser()]).parse(source)
+    precompile(document).result()
+    code_cache = document.code_cache
+    assert code_cache is not None
+    compare([key[1] for key in code_cache.codes], expected=['y = x + 1\n'])
+    cached = dict(code_cache.codes)
+    examples = list(document)
+    examples[0].evaluate()
+    examples[1].evaluate()
+    compare(code_cache.codes, expected=cached)
+    # syntax errors are reported when the example is evaluated:
+    with ShouldRaise(SyntaxError) as s:
+        examples[3].evaluate()
+    compare(s.raised.lineno, expected=11)
+
+
+def test_sybil_precompile(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> x = 1\n')
+    with Replacer() as replace:
+        precompile_ = replace('sybil.sybil.precompile', Mock())
+        document = Sybil([DocTestParser()], precompile=True).parse(source)
+        Sybil([DocTestParser()]).parse(source)
+    compare(precompile_.call_args_list, expected=[((document,), {})])
+
+
+def test_shutdown_precompile(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('.. code-block:: python\n\n  x = 1\n')
+    document = Sybil([PythonCodeBlockParser()]).parse(source)
+    precompile(document).result()
+    shutdown_precompile()
+    compare(cache._executor, expected=None)
+    # nothing to shut down:
+    shutdown_precompile()
+    # a new executor is started when needed:
+    document = Sybil([PythonCodeBlockParser()]).parse(source)
+    precompile(document).result()
+    assert document.code_cache is not None
+    compare(len(document.code_cache.codes), expected=1)
+    shutdown_precompile()
+
+
+def test_wait_for_other_process(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    other = ParseCache(tmp_path / 'cache', [CountingParser(DocTestParser())])
+    key = other.key(Document, str(source), source.read_text())
+    lock_path = other.lock(key)
+    assert lock_path is not None
+
+    def finish_parsing():
+        document = Document.parse(str(source), *other.parsers)
+        other.store(key, [region for _, region in document.regions])
+        lock_path.unlink()
+
+    parser = CountingParser(DocTestParser())
+    cache = ParseCache(tmp_path / 'cache', [parser])
+    timer = Timer(0.1, finish_parsing)
+    timer.start()
+    document = cache.parse(Document, source, 'utf-8')
+    timer.join()
+    compare(parser.calls, expected=[])
+    compare(len(document.regions), expected=1)
+
+
+def test_other_process_stores_nothing(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    parser = CountingParser(DocTestParser())
+    cache = ParseCache(tmp_path / 'cache', [parser])
+    key = cache.key(Document, str(source), source.read_text())
+    lock_path = cache.lock(key)
+    assert lock_path is not None
+    timer = Timer(0.1, lock_path.unlink)
+    timer.start()
+    document = cache.parse(Document, source, 'utf-8')
+    timer.join()
+    compare(parser.calls, expected=[str(source)])
+    compare(len(document.regions), expected=1)
+    assert not lock_path.exists()
+
+
+def test_stale_lock(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    parser = CountingParser(DocTestParser())
+    cache = ParseCache(tmp_path / 'cache', [parser])
+    key = cache.key(Document, str(source), source.read_text())
+    lock_path = cache.lock(key)
+    assert lock_path is not None
+    locked_at = time.time() - cache.lock_timeout - 1
+    os.utime(lock_path, (locked_at, locked_at))
+    cache.parse(Document, source, 'utf-8')
+    compare(parser.calls, expected=[str(source)])
+    # The lock belongs to another process, so is left alone:
+    assert lock_path.exists()
+    # ...but the entry is there for next time:
+    cache.parse(Document, source, 'utf-8')
+    compare(len(parser.calls), expected=1)
+
+
+def test_lock_released_on_error(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+
+    def parser(document):
+        raise ValueError('boom')
+
+    cache = ParseCache(tmp_path / 'cache', [parser])
+    with ShouldRaise(ValueError('boom')):
+        cache.parse(Document, source, 'utf-8')
+    compare(list((tmp_path / 'cache' / 'regions').iterdir()), expected=[])
+
+
+def test_manifest(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache = ParseCache(tmp_path / 'cache', [DocTestParser()])
+    compare(cache.load_manifest(Document, source, ''), expected=None)
+    cache.store_manifest(Document, source, '', source.stat(), [['line:1', 1, 1]])
+    compare(cache.load_manifest(Document, source, ''), expected=[['line:1', 1, 1]])
+    # Manifests are specific to the document type and name of the Sybil:
+    compare(cache.load_manifest(PythonDocStringDocument, source, ''), expected=None)
+    compare(cache.load_manifest(Document, source, 'other'), expected=None)
+    # ...and the parser configuration:
+    other = ParseCache(tmp_path / 'cache', [DocTestParser(optionflags=1)])
+    compare(other.load_manifest(Document, source, ''), expected=None)
+
+
+def test_manifest_file_changed(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache = ParseCache(tmp_path / 'cache', [DocTestParser()])
+    cache.store_manifest(Document, source, '', source.stat(), [])
+    source.write_text('>>> 2\n2\n')
+    os.utime(source, ns=(0, 0))
+    compare(cache.load_manifest(Document, source, ''), expected=None)
+    source.unlink()
+    compare(cache.load_manifest(Document, source, ''), expected=None)
+
+
+def test_manifest_corrupt(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache = ParseCache(tmp_path / 'cache', [DocTestParser()])
+    cache.store_manifest(Document, source, '', source.stat(), [])
+    (manifest,) = (tmp_path / 'cache' / 'manifests').iterdir()
+    for text in 'garbage', '[]', '{}':
+        manifest.write_text(text)
+        compare(cache.load_manifest(Document, source, ''), expected=None)
+
+
+def test_skip_unchanged_requires_cache_dir():
+    with ShouldRaise(ValueError('skip_unchanged=True requires a cache_dir')):
+        Sybil([], skip_unchanged=True)
+
+
+def test_skip_unchanged_not_with_fork(tmp_path: Path):
+    with ShouldRaise(ValueError('skip_unchanged=True cannot be used with fork=True')):
+        Sybil([], cache_dir=str(tmp_path), skip_unchanged=True, fork=True)
+
+
+def test_unchanged(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    cache = ParseCache(tmp_path / 'cache', [DocTestParser()])
+    compare(cache.unchanged(Document, source, ''), expected=False)
+    cache.store_result(Document, source, '', file_hash(str(source)))
+    compare(cache.unchanged(Document, source, ''), expected=True)
+    compare(cache.unchanged(Document, source, 'other'), expected=False)
+    source.write_text('>>> 2\n2\n')
+    compare(cache.unchanged(Document, source, ''), expected=False)
+    (result,) = (tmp_path / 'cache' / 'results').iterdir()
+    result.write_text('garbage')
+    compare(cache.unchanged(Document, source, ''), expected=False)
+
+
+def test_unchanged_module_removed(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('>>> 1\n1\n')
+    module = tmp_path / 'module.py'
+    module.write_text('')
+    cache = ParseCache(tmp_path / 'cache', [DocTestParser()])
+    with Replacer() as replace:
+        replace('sybil.cache.project_module_files', lambda: [str(module)])
+        cache.store_result(Document, source, '', file_hash(str(source)))
+    compare(cache.unchanged(Document, source, ''), expected=True)
+    module.unlink()
+    compare(cache.unchanged(Document, source, ''), expected=False)
+
+
+def test_project_module_files():
+    files = project_module_files()
+    assert __file__ in files
+    assert pickle.__file__ not in files
+    assert pytest.__file__ not in files
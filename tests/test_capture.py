@@ -1,6 +1,7 @@
 import json
 
 import pytest
+from testfixtures import ShouldRaise, compare
 
 from sybil import Document
 from sybil.parsers.rest import CaptureParser
@@ -43,3 +44,37 @@ def test_capture_codeblock():
     examples, namespace = parse('capture_codeblock.txt', CaptureParser(), expected=1)
     examples[0].evaluate()
     assert json.loads(namespace['json']) == {"a key": "value", "b key": 42}
+
+
+def captured(text: str) -> list:
+    document = Document(text, 'sample.txt')
+    return [(r.start, r.end, r.parsed) for r in CaptureParser()(document)]
+
+
+def test_nested_capture_not_parsed():
+    text = 'Outer::\n\n  Inner::\n\n    x\n\n  .. -> inner\n\n.. -> outer\n'
+    compare(
+        captured(text),
+        expected=[(0, 42, ('outer', 'Inner::\n\n  x\n\n.. -> inner\n'))],
+    )
+
+
+def test_capture_with_other_line_breaks():
+    # str.splitlines() treats form feeds and carriage returns as ending lines:
+    text = 'Block::\x0c\x0c  x\r\n  y\x0c\x0c.. -> name\nMore::\n\n  z\n\n.. -> other'
+    compare(
+        captured(text),
+        expected=[
+            (30, 43, ('other', 'z\n')),
+            (0, 19, ('name', 'x\r\n  y\n')),
+        ],
+    )
+
+
+def test_capture_at_start_of_document():
+    with ShouldRaise(
+        ValueError(
+            "couldn't find the start of the block to match '.. -> x' on line 3 of sample.txt"
+        )
+    ):
+        captured('  a\n\n.. -> x\n')
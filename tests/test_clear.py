@@ -1,5 +1,11 @@
-from sybil.parsers.rest import ClearNamespaceParser, DocTestParser
-from .helpers import parse
+from pathlib import Path
+
+from testfixtures import compare
+
+from sybil import Document
+from sybil.integration.pytest import independent_chunks
+from sybil.parsers.rest import ClearNamespaceParser, DocTestParser, SkipParser
+from .helpers import parse, sample_path
 
 
 def test_basic():
@@ -7,3 +13,41 @@ def test_basic():
     for example in examples:
         example.evaluate()
     assert 'x' not in namespace, namespace
+
+
+def chunk_lines(path: Path, split: bool = True):
+    document = Document.parse(str(path), DocTestParser(), ClearNamespaceParser(), SkipParser())
+    return [[e.line for e in chunk] for chunk in independent_chunks(document.examples(), split)]
+
+
+def test_independent_chunks():
+    compare(chunk_lines(sample_path('clear.txt'), split=False), expected=[[1, 2, 7, 9]])
+    compare(chunk_lines(sample_path('clear.txt')), expected=[[1, 2], [7, 9]])
+
+
+def test_independent_chunks_starting_with_clear(tmp_path: Path):
+    path = tmp_path / 'doc.txt'
+    path.write_text('.. clear-namespace\n\n>>> x = 1\n\n.. clear-namespace\n')
+    compare(chunk_lines(path), expected=[[1, 3], [5]])
+
+
+def test_independent_chunks_skipped_clear(tmp_path: Path):
+    path = tmp_path / 'doc.txt'
+    path.write_text(
+        '>>> x = 1\n'
+        '\n'
+        '.. skip: next\n'
+        '\n'
+        '.. clear-namespace\n'
+        '\n'
+        '.. skip: start\n'
+        '\n'
+        '.. clear-namespace\n'
+        '\n'
+        '.. skip: end\n'
+        '\n'
+        '.. clear-namespace\n'
+        '\n'
+        '>>> x = 2\n'
+    )
+    compare(chunk_lines(path), expected=[[1, 3, 5, 7, 9, 11], [13, 15]])
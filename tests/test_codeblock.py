@@ -1,11 +1,14 @@
 import __future__
+import warnings
 from pathlib import Path
+from types import CodeType
 
 import pytest
-from testfixtures import compare
+from testfixtures import ShouldRaise, compare
 
 from sybil import Example, Sybil
 from sybil.document import Document
+from sybil.evaluators.python import compile_at, pad
 from sybil.parsers.codeblock import PythonCodeBlockParser, CodeBlockParser
 from sybil.parsers.rest import DocTestParser
 from .helpers import check_excinfo, parse, sample_path, check_path, SAMPLE_PATH, add_to_python_path
@@ -160,6 +163,80 @@ def test_line_numbers_with_options():
     check_excinfo(examples[1], excinfo, 'Boom 2', lineno=14)
 
 
+def code_lines(code: CodeType):
+    # The first position is where the code object starts, which is always line 1 for modules:
+    lines = [(code.co_name, list(code.co_positions())[1:])]
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            lines.append(const.co_firstlineno)
+            lines.extend(code_lines(const))
+    return lines
+
+
+def test_compile_at_same_lines_as_padding():
+    source = (
+        'x = 1\n'
+        'def f(a):\n'
+        '    return [1 / a for _ in range(1)]\n'
+        'class C:\n'
+        '    def m(self):\n'
+        '        raise ValueError(\n'
+        '            "x"\n'
+        '        )\n'
+    )
+    padded = compile(pad(source, 1000), 'test.txt', 'exec', dont_inherit=True)
+    compare(code_lines(compile_at(source, 'test.txt', 1000)), expected=code_lines(padded))
+
+
+@pytest.mark.parametrize('source', ['x = 1\nx is 1\n', 'x = "\\d"\n', 'assert (x, "y")\n'])
+def test_compile_at_warnings_on_right_line(source):
+    with warnings.catch_warnings(record=True) as expected:
+        warnings.simplefilter('always')
+        compile(pad(source, 40), 'test.txt', 'exec', dont_inherit=True)
+    with warnings.catch_warnings(record=True) as actual:
+        warnings.simplefilter('always')
+        compile_at(source, 'test.txt', 40)
+    assert expected
+    compare(
+        expected=[(w.category, str(w.message), w.filename, w.lineno) for w in expected],
+        actual=[(w.category, str(w.message), w.filename, w.lineno) for w in actual],
+    )
+
+
+def test_compile_at_warning_as_error():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with ShouldRaise(SyntaxError) as s:
+            compile_at('x = 1\nx is 1\n', 'test.txt', 40)
+    compare(s.raised.lineno, expected=42)
+
+
+def test_code_with_warnings_not_cached(tmp_path: Path):
+    source = tmp_path / 'doc.txt'
+    source.write_text('Text\n\n.. code-block:: python\n\n  x = 1\n  y = x is 1\n')
+    document = Sybil([PythonCodeBlockParser()]).parse(source)
+    (example,) = document
+    for _ in range(2):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            example.evaluate()
+        compare([(w.category, w.lineno) for w in caught], expected=[(SyntaxWarning, 6)])
+    assert document.code_cache is not None
+    compare(document.code_cache.codes, expected={})
+
+
+@pytest.mark.parametrize('source', ['x = (\n', 'if x:\npass\n', '"""\n', 'a b\n'])
+def test_compile_at_syntax_error(source):
+    with ShouldRaise() as expected:
+        compile(pad(source, 40), 'test.txt', 'exec', dont_inherit=True)
+    with ShouldRaise() as actual:
+        compile_at(source, 'test.txt', 40)
+    compare(
+        expected=(repr(expected.raised), expected.raised.lineno, expected.raised.end_lineno),
+        actual=(repr(actual.raised), actual.raised.lineno, actual.raised.end_lineno),
+    )
+
+
 def test_codeblocks_in_docstrings():
     sybil = Sybil([PythonCodeBlockParser()])
     with add_to_python_path(SAMPLE_PATH):
@@ -2,17 +2,30 @@
 This is a module doc string.
 """  # This is a comment on how annoying 3.7 and earlier are!
 
+import ast
 import re
+import tracemalloc
 from functools import partial
 from pathlib import Path
 from collections.abc import Iterable
+from typing import Callable
 
 from testfixtures import compare, ShouldRaise
 
-from sybil import Region, Example
-from sybil.document import PythonDocStringDocument, Document
+from sybil import Example, Lexeme, Region
+from sybil.document import (
+    DOCSTRING_NODES,
+    PythonDocStringDocument,
+    Document,
+    docstring_nodes,
+)
 from sybil.example import NotEvaluated, SybilFailure
 from sybil.parsers.abstract.lexers import LexingException
+from sybil.parsers.markdown import PythonCodeBlockParser as MarkdownPythonCodeBlockParser
+from sybil.parsers.myst import PythonCodeBlockParser as MystPythonCodeBlockParser
+from sybil.parsers.myst import SkipParser as MystSkipParser
+from sybil.parsers.rest import DocTestParser, PythonCodeBlockParser
+from sybil.text import LineNumberOffsets, combined_markers
 from .helpers import ast_docstrings, parse, sample_path
 
 
@@ -149,3 +162,149 @@ def test_nested_evaluators_not_evaluated_from_region():
     examples, namespace = parse('sample1.txt', parser, expected=1)
     with ShouldRaise(SybilFailure(examples[0], f'{evaluator!r} should not raise NotEvaluated()')):
         examples[0].evaluate()
+
+
+def test_line_column():
+    text = Path(sample_path('doctest.txt')).read_text()
+    document = Document(text, 'doctest.txt')
+    for position in range(len(text) + 2):
+        line = text.count('\n', 0, position) + 1
+        column = position - text.rfind('\n', 0, position)
+        compare(document.line_column(position), expected=f'line {line}, column {column}')
+    assert document.line_offsets is document.line_offsets
+
+
+def test_line_column_no_newlines():
+    compare(LineNumberOffsets('').line_column(0), expected=(1, 1))
+    compare(LineNumberOffsets('abc').line_column(2), expected=(1, 3))
+    compare(LineNumberOffsets('\n\n').line_column(2), expected=(3, 1))
+
+
+def test_examples_on_same_line():
+    def parser(document: Document) -> Iterable[Region]:
+        for match in re.finditer('x', document.text):
+            yield Region(match.start(), match.end(), None, None)
+
+    document = Document('one\nx x\n  x\n', 'sample.txt')
+    for region in parser(document):
+        document.add(region)
+    compare([(e.line, e.column) for e in document], expected=[(2, 1), (2, 3), (3, 3)])
+
+
+def test_extract_docstrings_with_line_offsets():
+    python_source_code = Path(__file__).read_text()
+    line_offsets = LineNumberOffsets(python_source_code)
+    compare(
+        list(PythonDocStringDocument.extract_docstrings(python_source_code, line_offsets)),
+        expected=list(PythonDocStringDocument.extract_docstrings(python_source_code)),
+    )
+
+
+def memory_per_instance(factory: Callable[[], object], count: int = 1000) -> float:
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        instances = [factory() for _ in range(count)]
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(instances) == count
+    return (end - start) / count
+
+
+class DictRegion:
+    __init__ = Region.__init__
+
+
+class DictExample:
+    __init__ = Example.__init__
+
+
+def test_region_memory():
+    lexemes = {'source': Lexeme('x = 1\n', offset=0, line_offset=0)}
+    slotted = memory_per_instance(lambda: Region(0, 10, 'parsed', None, lexemes))
+    unslotted = memory_per_instance(lambda: DictRegion(0, 10, 'parsed', None, lexemes))
+    assert not hasattr(Region(0, 10), '__dict__')
+    assert slotted < unslotted, f'{slotted} bytes per region, {unslotted} without slots'
+
+
+def test_example_memory():
+    document = Document('', 'sample.txt')
+    region = Region(0, 10, 'parsed')
+    slotted = memory_per_instance(lambda: Example(document, 1, 1, region, {}))
+    unslotted = memory_per_instance(lambda: DictExample(document, 1, 1, region, {}))
+    assert not hasattr(Example(document, 1, 1, region, {}), '__dict__')
+    assert slotted < unslotted, f'{slotted} bytes per example, {unslotted} without slots'
+
+
+def test_lexeme_text():
+    lexeme = Lexeme('foo', offset=1, line_offset=2)
+    compare(lexeme.text, expected='foo', strict=True)
+    compare(vars(lexeme), expected={'offset': 1, 'line_offset': 2})
+
+
+def test_docstring_nodes_same_as_walk():
+    source = (
+        'class A:\n'
+        '    def f(self):\n'
+        '        x = [lambda: 1 for _ in range(2)]\n'
+        '        def g(): pass\n'
+        'if True:\n'
+        '    async def h(): pass\n'
+        'try:\n'
+        '    pass\n'
+        'except Exception:\n'
+        '    class B: pass\n'
+        'finally:\n'
+        '    def i(): pass\n'
+        'match x:\n'
+        '    case 1:\n'
+        '        def j(): pass\n'
+        'with x:\n'
+        '    class C: pass\n'
+    )
+    for text in source, Path(__file__).read_text():
+        tree = ast.parse(text)
+        expected = [node for node in ast.walk(tree) if isinstance(node, DOCSTRING_NODES)]
+        compare(list(docstring_nodes(tree)), expected=expected)
+
+
+def test_docstrings_not_extracted_without_markers(tmp_path: Path):
+    # This isn't valid Python, so would fail if its docstrings were extracted:
+    path = tmp_path / 'example.py'
+    path.write_text('def f(:\n    """\n    .. code-block:: python\n    """\n')
+    document = PythonDocStringDocument.parse(str(path), DocTestParser())
+    compare(list(document), expected=[])
+    with ShouldRaise(SyntaxError):
+        PythonDocStringDocument.parse(str(path), PythonCodeBlockParser())
+    with ShouldRaise(SyntaxError):
+        PythonDocStringDocument.parse(str(path), DocTestParser(), lambda document: [])
+
+
+def test_parser_markers():
+    compare(combined_markers([DocTestParser(), PythonCodeBlockParser()]), expected=('>>>', '..'))
+    compare(
+        combined_markers([MarkdownPythonCodeBlockParser(), MystSkipParser()]),
+        expected=('```', '~~~', '<!--', '%'),
+    )
+    compare(combined_markers([DocTestParser(), lambda document: []]), expected=None)
+    compare(combined_markers([]), expected=())
+
+
+def test_docstrings_parsed_separately(tmp_path: Path):
+    # An unclosed fence in one docstring must not hide the code block in the next:
+    path = tmp_path / 'sample.py'
+    path.write_text(
+        'def f():\n'
+        '    """\n'
+        '    ```text\n'
+        '    """\n'
+        'def g():\n'
+        '    """\n'
+        '    ```{code-block} python\n'
+        '    x = 1\n'
+        '    ```\n'
+        '    """\n'
+    )
+    document = PythonDocStringDocument.parse(str(path), MystPythonCodeBlockParser())
+    compare([e.parsed for e in document], expected=['x = 1\n'])
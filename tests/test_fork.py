@@ -0,0 +1,174 @@
+import os
+import pickle
+import sys
+from io import BytesIO
+from pathlib import Path
+from unittest import SkipTest
+
+import pytest
+from testfixtures import Replacer, ShouldRaise, compare, not_there
+
+from sybil import Document, Sybil
+from sybil.example import SybilFailure
+from sybil.fork import ForkedExamples, ForkedFailure, evaluate_examples, skip_exceptions
+from sybil.parsers.rest import DocTestParser, PythonCodeBlockParser, SkipParser
+from .helpers import needs_fork
+
+
+def make_document(tmp_path: Path, text: str) -> Document:
+    source = tmp_path / 'doc.txt'
+    source.write_text(text)
+    return Document.parse(str(source), DocTestParser(), PythonCodeBlockParser(), SkipParser())
+
+
+SAMPLE = (
+    '>>> x = 1\n'
+    '>>> x\n'
+    '2\n'
+    '\n'
+    '.. skip: next "because"\n'
+    '\n'
+    '>>> 1/0\n'
+    '\n'
+    '.. code-block:: python\n'
+    '\n'
+    '    raise ValueError(x)\n'
+)
+
+
+def test_evaluate_examples(tmp_path: Path):
+    document = make_document(tmp_path, SAMPLE)
+    output = BytesIO()
+    evaluate_examples(list(document), BytesIO(b'.' * 5), output)
+    output.seek(0)
+    results = []
+    while output.tell() < len(output.getvalue()):
+        results.append(pickle.load(output))
+    compare([kind for kind, _ in results], expected=['pass', 'failure', 'pass', 'skip', 'error'])
+    compare(results[3], expected=('skip', 'because'))
+    assert results[4][1].endswith('ValueError: 1\n'), results[4][1]
+
+
+def test_evaluate_examples_base_exceptions(tmp_path: Path):
+    document = make_document(
+        tmp_path,
+        '.. code-block:: python\n\n    import pytest, sys\n\n'
+        '.. code-block:: python\n\n    pytest.skip("not today")\n\n'
+        '.. code-block:: python\n\n    pytest.fail("oops")\n\n'
+        '.. code-block:: python\n\n    sys.exit(2)\n\n'
+        '.. code-block:: python\n\n    x = 1\n',
+    )
+    output = BytesIO()
+    evaluate_examples(list(document), BytesIO(b'.' * 5), output)
+    output.seek(0)
+    results = []
+    while output.tell() < len(output.getvalue()):
+        results.append(pickle.load(output))
+    compare([kind for kind, _ in results], expected=['pass', 'skip', 'error', 'error', 'pass'])
+    compare(results[1], expected=('skip', 'not today'))
+    assert 'Failed: oops' in results[2][1], results[2][1]
+    assert results[3][1].endswith('SystemExit: 2\n'), results[3][1]
+    compare(document.namespace['x'], expected=1)
+
+
+def test_evaluate_examples_only_when_requested(tmp_path: Path):
+    document = make_document(tmp_path, SAMPLE)
+    output = BytesIO()
+    evaluate_examples(list(document), BytesIO(b'..'), output)
+    output.seek(0)
+    compare(pickle.load(output), expected=('pass', ''))
+    compare(pickle.load(output)[0], expected='failure')
+    compare(output.read(), expected=b'')
+
+
+def test_skip_exceptions_without_pytest(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delitem(sys.modules, 'pytest')
+    compare(skip_exceptions(), expected=(SkipTest,))
+
+
+@needs_fork
+def test_forked(tmp_path: Path):
+    document = make_document(tmp_path, SAMPLE)
+    examples = list(document)
+    forked = ForkedExamples(examples)
+    forked.evaluate(examples[0])
+    with ShouldRaise(SybilFailure) as s:
+        forked.evaluate(examples[1])
+    assert s.raised.example is examples[1]
+    forked.evaluate(examples[2])
+    with ShouldRaise(SkipTest('because')):
+        forked.evaluate(examples[3])
+    with ShouldRaise(ForkedFailure) as s:
+        forked.evaluate(examples[4])
+    assert 'ValueError: 1' in str(s.raised)
+    compare(forked.finish(), expected=0)
+    # nothing happened in this process:
+    compare(document.namespace, expected={})
+
+
+@needs_fork
+def test_forked_process_exits(tmp_path: Path):
+    document = make_document(tmp_path, '>>> import os\n>>> os._exit(3)\n>>> 1\n1\n')
+    examples = list(document)
+    forked = ForkedExamples(examples)
+    forked.evaluate(examples[0])
+    text = 'Forked process exited with status 3 before evaluating this example'
+    with ShouldRaise(ForkedFailure(text)):
+        forked.evaluate(examples[1])
+    with ShouldRaise(ForkedFailure(text)):
+        forked.evaluate(examples[2])
+    compare(forked.finish(), expected=3)
+
+
+@needs_fork
+def test_forked_process_stops_when_not_needed(tmp_path: Path):
+    document = make_document(tmp_path, '>>> 1\n1\n>>> import os\n>>> os._exit(3)\n')
+    examples = list(document)
+    forked = ForkedExamples(examples)
+    forked.evaluate(examples[0])
+    # The example that would exit with a different status is never evaluated:
+    compare(forked.finish(), expected=0)
+    compare(forked.finish(), expected=0)
+
+
+@needs_fork
+def test_forked_examples_evaluated_when_requested(tmp_path: Path):
+    marker = tmp_path / 'marker'
+    document = make_document(
+        tmp_path,
+        f'>>> from pathlib import Path\n>>> Path({str(marker)!r}).write_text("x")\n1\n',
+    )
+    examples = list(document)
+    forked = ForkedExamples(examples)
+    forked.evaluate(examples[0])
+    assert not marker.exists()
+    forked.evaluate(examples[1])
+    assert marker.exists()
+    compare(forked.finish(), expected=0)
+
+
+def test_finish_before_start():
+    compare(ForkedExamples([]).finish(), expected=None)
+
+
+@needs_fork
+def test_fork_not_available():
+    with Replacer() as replace:
+        replace('os.fork', not_there)
+        with ShouldRaise(ValueError('fork=True requires os.fork(), which is not available')):
+            Sybil([], fork=True)
+    assert hasattr(os, 'fork')
+
+
+@needs_fork
+def test_fork_not_with_precompile():
+    with ShouldRaise(ValueError('precompile=True cannot be used with fork=True')):
+        Sybil([], fork=True, precompile=True)
+
+
+@needs_fork
+@pytest.mark.parametrize('integration', ['pytest', 'unittest'])
+def test_fork_not_with_precompile_in_collection(integration: str):
+    sybils = Sybil([], fork=True) + Sybil([], precompile=True)
+    with ShouldRaise(ValueError('precompile=True cannot be used with fork=True')):
+        getattr(sybils, integration)()
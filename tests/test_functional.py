@@ -1,11 +1,17 @@
+import os
+import subprocess
 import sys
 from pathlib import Path
+from shutil import copy
+from typing import List, Optional
+import unittest
 
 import pytest
 from pytest import CaptureFixture
-from testfixtures import Replacer, compare, not_there
+from testfixtures import Replacer, ShouldRaise, compare, not_there
 
-from sybil import Sybil
+from sybil import Document, Sybil, cache
+from sybil.integration.pytest import changed_paths
 from sybil.parsers.rest import PythonCodeBlockParser, DocTestParser
 from sybil.python import import_cleanup
 from .helpers import (
@@ -20,6 +26,7 @@ from .helpers import (
     clone_functional_sample,
     check_path,
     sample_path,
+    needs_fork,
 )
 
 
@@ -270,6 +277,19 @@ def test_filter_exclude_by_name(tmp_path: Path, capsys: CaptureFixture[str], run
     assert results.total == 2, results.out.text
 
 
+@pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
+def test_filter_exclude_directory(tmp_path: Path, capsys: CaptureFixture[str], runner: str):
+    write_doctest(tmp_path, 'foo.txt')
+    write_doctest(tmp_path, 'generated', 'foo.txt')
+    write_doctest(tmp_path, 'child', 'generated', 'deeper', 'foo.txt')
+    write_doctest(tmp_path, 'child', 'foo.txt')
+    write_config(tmp_path, runner, pattern="'*.txt'", exclude="'generated'")
+    results = run(capsys, runner, tmp_path)
+    results.out.assert_has_run(runner, '/foo.txt')
+    results.out.assert_has_run(runner, '/child/foo.txt')
+    assert results.total == 2, results.out.text
+
+
 @pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
 def test_filter_include_filenames(tmp_path: Path, capsys: CaptureFixture[str], runner: str):
     write_doctest(tmp_path, 'foo.txt')
@@ -415,6 +435,29 @@ def test_multiple_sybils_process_all(tmp_path: Path, capsys: CaptureFixture[str]
     results.out.assert_has_run(runner, 'test.txt', sybil='b')
 
 
+@pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
+def test_multiple_sybils_different_excludes(
+    tmp_path: Path, capsys: CaptureFixture[str], runner: str
+):
+    write_doctest(tmp_path, 'test.rst')
+    write_doctest(tmp_path, 'generated', 'test.rst')
+    config_template = """
+    from sybil.parsers.rest import DocTestParser
+    from sybil import Sybil
+
+    sybil1 = Sybil(parsers=[DocTestParser()], pattern='*.rst', exclude='generated', name='a')
+    sybil2 = Sybil(parsers=[DocTestParser()], pattern='*.rst', name='b')
+
+    {assigned_name} = (sybil1 + sybil2).{integration}()
+    """
+    write_config(tmp_path, runner, template=config_template)
+    results = run(capsys, runner, tmp_path)
+    compare(results.total, expected=3, suffix=results.out.text)
+    results.out.assert_has_run(runner, '/test.rst', sybil='a')
+    results.out.assert_has_run(runner, '/test.rst', sybil='b')
+    results.out.assert_has_run(runner, '/generated/test.rst', sybil='b')
+
+
 @pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
 def test_multiple_sybils_process_one_each(tmp_path: Path, capsys: CaptureFixture[str], runner: str):
     write_doctest(tmp_path, 'test.rst')
@@ -523,3 +566,552 @@ def test_request_missing_fixtures(tmp_path: Path, capsys: CaptureFixture[str]):
     compare(results.total, expected=1, suffix=results.out.text)
     compare(results.failures, expected=1, suffix=results.out.text)
     compare(results.errors, expected=0, suffix=results.out.text)
+
+
+@pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
+@needs_fork
+def test_fork(tmp_path: Path, capsys: CaptureFixture[str], runner: str):
+    copy(sample_path('fork.rst'), tmp_path / 'one.rst')
+    copy(sample_path('fork.rst'), tmp_path / 'two.rst')
+    config_template = """
+    import os
+    from sybil import Sybil
+    from sybil.parsers.rest import DocTestParser, PythonCodeBlockParser, SkipParser
+
+    def setup(namespace):
+        namespace['parent_pid'] = os.getpid()
+
+    def teardown(namespace):
+        assert 'SYBIL_FORK_TEST' not in os.environ
+
+    {assigned_name} = Sybil(
+    {params}
+    ).{integration}()
+    """
+    write_config(
+        tmp_path,
+        runner,
+        template=config_template,
+        parsers='[DocTestParser(), PythonCodeBlockParser(), SkipParser()]',
+        pattern="'*.rst'",
+        setup='setup',
+        teardown='teardown',
+        fork='True',
+    )
+    results = run(capsys, runner, tmp_path)
+    out = results.out
+    # Each document sees none of the changes made by the other:
+    compare(results.total, expected=16, suffix=out.text)
+    if runner == PYTEST:
+        compare(results.failures, expected=4, suffix=out.text)
+        compare(results.errors, expected=0, suffix=out.text)
+    else:
+        compare(results.failures, expected=2, suffix=out.text)
+        compare(results.errors, expected=2, suffix=out.text)
+    out.assert_present('Expected:\n    3\nGot:\n    2')
+    out.assert_present('ValueError: boom')
+    assert 'SYBIL_FORK_TEST' not in os.environ
+
+
+@needs_fork
+def test_fork_output_captured_with_example(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'doc.rst').write_text(
+        '.. code-block:: python\n\n    print("first output")\n\n'
+        '.. code-block:: python\n\n    print("second output")\n    raise ValueError("boom")\n'
+    )
+    (tmp_path / 'conftest.py').write_text(
+        'from sybil import Sybil\n'
+        'from sybil.parsers.rest import PythonCodeBlockParser\n'
+        "pytest_collect_file = Sybil([PythonCodeBlockParser()], pattern='*.rst', fork=True).pytest()\n"
+    )
+    results = run_pytest(capsys, tmp_path, '--capture=fd')
+    compare(results.total, expected=2, suffix=results.out.text)
+    compare(results.failures, expected=1, suffix=results.out.text)
+    # Only the output from the failing example is reported with it:
+    results.out.assert_present('-- Captured stdout call --')
+    results.out.assert_present('second output')
+    results.out.assert_not_present('first output')
+
+
+FORK_FIXTURES_CONFIG = """
+import pytest
+from sybil import Sybil
+from sybil.parsers.rest import DocTestParser
+
+@pytest.fixture(scope='session')
+def session_value():
+    return 1
+
+@pytest.fixture
+def function_value():
+    return 2
+
+pytest_collect_file = Sybil(
+    [DocTestParser()], pattern='*.rst', fixtures=['{fixture}'], fork=True
+).pytest()
+"""
+
+
+@needs_fork
+def test_fork_session_fixture(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'doc.rst').write_text('>>> session_value\n1\n>>> session_value\n1\n')
+    (tmp_path / 'conftest.py').write_text(FORK_FIXTURES_CONFIG.format(fixture='session_value'))
+    results = run(capsys, PYTEST, tmp_path)
+    compare(results.total, expected=2, suffix=results.out.text)
+    compare(results.failures, expected=0, suffix=results.out.text)
+
+
+@needs_fork
+def test_fork_function_fixture(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'doc.rst').write_text('>>> function_value\n2\n')
+    (tmp_path / 'conftest.py').write_text(FORK_FIXTURES_CONFIG.format(fixture='function_value'))
+    results = run(capsys, PYTEST, tmp_path)
+    results.out.assert_present(
+        'ValueError: fork=True cannot be used with function-scoped fixtures: function_value'
+    )
+    compare(results.total, expected=0, suffix=results.out.text)
+
+
+@pytest.mark.parametrize('split', [False, True])
+def test_xdist_groups(tmp_path: Path, capsys: CaptureFixture[str], split: bool):
+    copy(sample_path('clear.txt'), tmp_path / 'one.rst')
+    copy(sample_path('clear.txt'), tmp_path / 'two.rst')
+    config_template = """
+    import pytest
+    from sybil import Sybil
+    from sybil.parsers.rest import ClearNamespaceParser, DocTestParser
+
+    class FakeXdist:
+        @staticmethod
+        def pytest_configure(config):
+            config.addinivalue_line('markers', 'xdist_group(name): group for xdist')
+
+        @staticmethod
+        def pytest_collection_finish(session):
+            for item in session.items:
+                print('group:', item.get_closest_marker('xdist_group').args[0])
+
+    def pytest_configure(config):
+        config.pluginmanager.register(FakeXdist(), 'xdist')
+
+    {assigned_name} = Sybil(
+    {params}
+    ).{integration}()
+    """
+    write_config(
+        tmp_path,
+        PYTEST,
+        template=config_template,
+        parsers='[DocTestParser(), ClearNamespaceParser()]',
+        pattern="'*.rst'",
+        split_at_clear_namespace=repr(split),
+    )
+    results = run(capsys, PYTEST, tmp_path)
+    compare(results.total, expected=8, suffix=results.out.text)
+    compare(results.failures, expected=0, suffix=results.out.text)
+    groups = [line[7:] for line in results.out.text.splitlines() if line.startswith('group: ')]
+    if split:
+        compare(
+            groups,
+            expected=['one.rst:0:1'] * 2
+            + ['one.rst:0:7'] * 2
+            + ['two.rst:0:1'] * 2
+            + ['two.rst:0:7'] * 2,
+        )
+    else:
+        compare(groups, expected=['one.rst:0:1'] * 4 + ['two.rst:0:1'] * 4)
+
+
+def test_no_xdist_groups(tmp_path: Path, capsys: CaptureFixture[str]):
+    copy(sample_path('clear.txt'), tmp_path / 'one.rst')
+    config_template = """
+    from sybil import Sybil
+    from sybil.parsers.rest import ClearNamespaceParser, DocTestParser
+
+    def pytest_collection_finish(session):
+        for item in session.items:
+            print('markers:', list(item.iter_markers()))
+
+    {assigned_name} = Sybil(
+    {params}
+    ).{integration}()
+    """
+    write_config(
+        tmp_path,
+        PYTEST,
+        template=config_template,
+        parsers='[DocTestParser(), ClearNamespaceParser()]',
+        pattern="'*.rst'",
+        split_at_clear_namespace='True',
+    )
+    results = run(capsys, PYTEST, tmp_path)
+    compare(results.total, expected=4, suffix=results.out.text)
+    results.out.assert_present('markers: []')
+    results.out.assert_not_present('markers: [Mark')
+
+
+def test_manifest(tmp_path: Path, capsys: CaptureFixture[str]):
+    copy(sample_path('clear.txt'), tmp_path / 'one.rst')
+    write_doctest(tmp_path, 'two.rst')
+    config_template = """
+    from sybil import Sybil
+    from sybil.parsers.rest import ClearNamespaceParser, DocTestParser
+
+    class ReportingSybil(Sybil):
+        def parse(self, path):
+            print('parsing', path.name)
+            return super().parse(path)
+
+    {assigned_name} = ReportingSybil(
+    {params}
+    ).{integration}()
+    """
+    write_config(
+        tmp_path,
+        PYTEST,
+        template=config_template,
+        parsers='[DocTestParser(), ClearNamespaceParser()]',
+        pattern="'*.rst'",
+        cache_dir="'.cache'",
+    )
+
+    results = run_pytest(capsys, tmp_path, '--collect-only')
+    compare(results.total, expected=5, suffix=results.out.text)
+    results.out.assert_present('parsing one.rst')
+    results.out.assert_present('parsing two.rst')
+
+    # Collecting unchanged files doesn't need them to be parsed:
+    results = run_pytest(capsys, tmp_path, '--collect-only')
+    compare(results.total, expected=5, suffix=results.out.text)
+    results.out.assert_not_present('parsing')
+
+    # Only the documents with examples being run are parsed:
+    results = run_pytest(capsys, tmp_path, '-k', 'one.rst')
+    compare(results.total, expected=4, suffix=results.out.text)
+    compare(results.failures, expected=0, suffix=results.out.text)
+    results.out.assert_present('parsing one.rst')
+    results.out.assert_not_present('parsing two.rst')
+    results.out.assert_present('one.rst::line:9,column:1 PASSED')
+
+    # Changing a file means it is parsed again:
+    (tmp_path / 'two.rst').write_text('>>> 1 + 1\n3\n\n>>> 2\n2\n')
+    results = run_pytest(capsys, tmp_path)
+    compare(results.total, expected=6, suffix=results.out.text)
+    compare(results.failures, expected=1, suffix=results.out.text)
+    results.out.assert_present('parsing two.rst')
+    results.out.assert_present('two.rst:1: SybilFailure')
+
+
+MANIFEST_OPTIONS_CONFIG = """
+from sybil import Sybil
+from sybil.parsers.rest import ClearNamespaceParser, DocTestParser
+
+class FakeXdist:
+    @staticmethod
+    def pytest_configure(config):
+        config.addinivalue_line('markers', 'xdist_group(name): group for xdist')
+
+    @staticmethod
+    def pytest_collection_finish(session):
+        for item in session.items:
+            print('item:', item.name, item.get_closest_marker('xdist_group').args[0])
+
+def pytest_configure(config):
+    config.pluginmanager.register(FakeXdist(), 'xdist')
+
+class NamingSybil(Sybil):
+    def identify(self, example):
+        return {identify}
+
+pytest_collect_file = NamingSybil(
+    parsers=[DocTestParser(), ClearNamespaceParser()],
+    pattern='*.rst',
+    cache_dir='.cache',
+    split_at_clear_namespace={split},
+).pytest()
+"""
+
+
+def test_manifest_options(tmp_path: Path, capsys: CaptureFixture[str]):
+    copy(sample_path('clear.txt'), tmp_path / 'one.rst')
+
+    def collect(split: bool, identify: str) -> List[str]:
+        (tmp_path / 'conftest.py').write_text(
+            MANIFEST_OPTIONS_CONFIG.format(split=split, identify=identify)
+        )
+        # Make sure the changed conftest.py is imported again:
+        with import_cleanup():
+            results = run_pytest(capsys, tmp_path, '--collect-only')
+        compare(results.total, expected=4, suffix=results.out.text)
+        return [line[6:] for line in results.out.text.splitlines() if line.startswith('item: ')]
+
+    line_names = "f'line:{example.line}'"
+    compare(collect(False, line_names), expected=[f'line:{n} one.rst:0:1' for n in (1, 2, 7, 9)])
+    # Changing split_at_clear_namespace means the examples are found again:
+    compare(
+        collect(True, line_names),
+        expected=[
+            'line:1 one.rst:0:1',
+            'line:2 one.rst:0:1',
+            'line:7 one.rst:0:7',
+            'line:9 one.rst:0:7',
+        ],
+    )
+    # As does changing how items are named:
+    compare(
+        collect(True, "f'at:{example.line}'"),
+        expected=['at:1 one.rst:0:1', 'at:2 one.rst:0:1', 'at:7 one.rst:0:7', 'at:9 one.rst:0:7'],
+    )
+
+
+def test_skip_unchanged(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'helper.py').write_text('VALUE = 1\n')
+    (tmp_path / 'one.rst').write_text('>>> from helper import VALUE\n>>> VALUE\n1\n')
+    (tmp_path / 'two.rst').write_text('>>> 1 + 1\n3\n\n>>> 2\n2\n')
+    (tmp_path / 'three.rst').write_text('.. skip: next "because"\n\n>>> 1 / 0\n')
+    write_config(
+        tmp_path,
+        PYTEST,
+        parsers='[DocTestParser(), SkipParser()]',
+        pattern="'*.rst'",
+        cache_dir="'.cache'",
+        skip_unchanged='True',
+    )
+    results = run_pytest(capsys, tmp_path)
+    compare(results.total, expected=6, suffix=results.out.text)
+    compare(results.failures, expected=1, suffix=results.out.text)
+    results.out.assert_not_present('unchanged since all examples last passed')
+
+    # Files where all examples passed or were skipped are now skipped, the failure runs again:
+    results = run_pytest(capsys, tmp_path, '-rs')
+    compare(results.failures, expected=1, suffix=results.out.text)
+    out = results.out
+    out.then_find('one.rst::line:1,column:1 SKIPPED')
+    out.then_find('one.rst::line:2,column:1 SKIPPED')
+    out.then_find('three.rst::line:1,column:1 SKIPPED')
+    out.then_find('three.rst::line:3,column:1 SKIPPED')
+    out.then_find('two.rst::line:1,column:1 FAILED')
+    out.then_find('two.rst::line:4,column:1 PASSED')
+    out.then_find('unchanged since all examples last passed')
+
+    # A change to a module that was imported means the examples are evaluated again:
+    (tmp_path / 'helper.py').write_text('VALUE = 1  # changed\n')
+    results = run_pytest(capsys, tmp_path)
+    out = results.out
+    out.then_find('one.rst::line:1,column:1 PASSED')
+    out.then_find('one.rst::line:2,column:1 PASSED')
+
+    # As is a change to the file itself:
+    (tmp_path / 'two.rst').write_text('>>> 1 + 1\n2\n\n>>> 2\n2\n')
+    results = run_pytest(capsys, tmp_path)
+    compare(results.failures, expected=0, suffix=results.out.text)
+    results.out.assert_present('two.rst::line:1,column:1 PASSED')
+    results = run_pytest(capsys, tmp_path)
+    results.out.assert_present('two.rst::line:1,column:1 SKIPPED')
+
+
+def test_skip_unchanged_partial_run(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'one.rst').write_text('>>> 1\n1\n\n>>> 2\n2\n')
+    write_config(tmp_path, PYTEST, pattern="'*.rst'", cache_dir="'.cache'", skip_unchanged='True')
+    # Results are only recorded when all the examples in a file have been run:
+    run_pytest(capsys, tmp_path, '-k', 'line:1')
+    results = run_pytest(capsys, tmp_path)
+    results.out.assert_present('one.rst::line:1,column:1 PASSED')
+    results.out.assert_present('one.rst::line:4,column:1 PASSED')
+
+
+def git(path: Path, *args: str):
+    subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        cwd=path,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_changed_since(tmp_path: Path, capsys: CaptureFixture[str]):
+    make_tree(tmp_path)
+    write_config(tmp_path, PYTEST, pattern="'**/*.rst'")
+    git(tmp_path, 'init', '-q')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-q', '-m', 'initial')
+    write_doctest(tmp_path, 'parent', 'foo.rst')
+    (tmp_path / 'parent' / 'child' / 'bar.rst').write_text(">>> 'changed'\n'changed'\n")
+    write_doctest(tmp_path, 'parent', 'new.rst')
+
+    results = run_pytest(capsys, tmp_path, '-p', 'sybil.integration.pytest_plugin')
+    compare(results.total, expected=5, suffix=results.out.text)
+
+    results = run_pytest(
+        capsys, tmp_path, '-p', 'sybil.integration.pytest_plugin', '--sybil-changed-since', 'HEAD'
+    )
+    results.out.assert_has_run(PYTEST, '/parent/child/bar.rst')
+    results.out.assert_has_run(PYTEST, '/parent/new.rst')
+    compare(results.total, expected=2, suffix=results.out.text)
+
+
+class StubConfig:
+    def __init__(self, rootpath: Path, ref: Optional[str]) -> None:
+        self.rootpath = rootpath
+        self.ref = ref
+        self.stash = pytest.Stash()
+
+    def getoption(self, name, default):
+        assert name == 'sybil_changed_since'
+        return self.ref
+
+
+def test_changed_since_not_used(tmp_path: Path):
+    compare(changed_paths(StubConfig(tmp_path, None)), expected=None)
+
+
+def test_changed_since_only_runs_git_once(tmp_path: Path):
+    git(tmp_path, 'init', '-q')
+    git(tmp_path, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    write_doctest(tmp_path, 'foo.rst')
+    config = StubConfig(tmp_path, 'HEAD')
+    compare(changed_paths(config), expected={tmp_path / 'foo.rst'})
+    write_doctest(tmp_path, 'bar.rst')
+    compare(changed_paths(config), expected={tmp_path / 'foo.rst'})
+
+
+def test_changed_since_bad_ref(tmp_path: Path):
+    git(tmp_path, 'init', '-q')
+    with ShouldRaise(pytest.UsageError) as s:
+        changed_paths(StubConfig(tmp_path, 'does-not-exist'))
+    assert str(s.raised).startswith('--sybil-changed-since: fatal:'), str(s.raised)
+
+
+def test_changed_since_no_git(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with ShouldRaise(pytest.UsageError('--sybil-changed-since requires git to be installed')):
+        changed_paths(StubConfig(tmp_path, 'HEAD'))
+
+
+class CountingSybil(Sybil):
+    parsed: List[str]
+
+    def parse(self, path: Path) -> Document:
+        self.parsed.append(path.name)
+        return super().parse(path)
+
+
+def test_unittest_lazy_suite(tmp_path: Path):
+    (tmp_path / 'one.rst').write_text('>>> x = 1\n>>> x\n1\n')
+    (tmp_path / 'two.rst').write_text('>>> y = 2\n')
+    sybil = CountingSybil([DocTestParser()], path=str(tmp_path), pattern='*.rst')
+    sybil.parsed = []
+    suite = sybil.unittest()(None, None, None)
+    compare(sybil.parsed, expected=[])
+
+    one, two = suite
+    compare(
+        [test.id() for test in one],
+        expected=[
+            f'{tmp_path / "one.rst"},line:1,column:1',
+            f'{tmp_path / "one.rst"},line:2,column:1',
+        ],
+    )
+    compare(sybil.parsed, expected=['one.rst'])
+    case = type(next(iter(one)))
+
+    result = unittest.TestResult()
+    suite.run(result)
+    compare((result.testsRun, result.errors, result.failures), expected=(3, [], []))
+    compare(sybil.parsed, expected=['one.rst', 'two.rst'])
+    # The documents' namespaces are released once their tests are done:
+    compare(case.namespace, expected={})
+
+
+def test_unittest_parse_failure(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'bad.rst').write_bytes(b'>>> 1\n1\n\xff\n')
+    write_doctest(tmp_path, 'good.rst')
+    write_config(tmp_path, UNITTEST, pattern="'*.rst'")
+    results = run(capsys, UNITTEST, tmp_path)
+    compare((results.total, results.errors), expected=(2, 1), suffix=results.out.text)
+    results.out.assert_present(f'ERROR: {tmp_path / "bad.rst"}')
+    results.out.assert_present('UnicodeDecodeError')
+
+
+INTERLEAVED_CONFIG = """
+from sybil import Sybil
+from sybil.parsers.rest import DocTestParser
+
+class ReportingSybil(Sybil):
+    def parse(self, path):
+        print('parsing', path.name)
+        return super().parse(path)
+
+def setup(namespace):
+    print('setup')
+
+def teardown(namespace):
+    print('teardown', sorted(name for name in namespace if len(name) == 1))
+
+def pytest_collection_modifyitems(items):
+    # Interleave the items from each file, as can happen with pytest-xdist:
+    items[:] = [items[i] for i in (0, 2, 1, 3)]
+
+pytest_collect_file = ReportingSybil(
+    [DocTestParser()], pattern='*.rst', setup=setup, teardown=teardown
+).pytest()
+"""
+
+
+def test_pytest_interleaved_files(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'one.rst').write_text('>>> x = 1\n>>> x\n1\n')
+    (tmp_path / 'two.rst').write_text('>>> y = 2\n>>> y\n2\n')
+    (tmp_path / 'conftest.py').write_text(INTERLEAVED_CONFIG)
+    results = run_pytest(capsys, tmp_path)
+    compare((results.total, results.failures), expected=(4, 0), suffix=results.out.text)
+    # Each document is parsed once, and its namespace kept until its last item has run:
+    compare(results.out.text.count('parsing one.rst'), expected=1, suffix=results.out.text)
+    compare(results.out.text.count('parsing two.rst'), expected=1, suffix=results.out.text)
+    out = results.out
+    out.then_find('one.rst::line:1,column:1')
+    out.then_find("teardown ['x']")
+    out.then_find('two.rst::line:1,column:1')
+    out.then_find("teardown ['y']")
+    out.then_find('one.rst::line:2,column:1 setup')
+    out.then_find("PASSEDteardown ['x']")
+    out.then_find('two.rst::line:2,column:1 setup')
+    out.then_find("PASSEDteardown ['y']")
+
+
+def test_pytest_releases_documents(tmp_path: Path, capsys: CaptureFixture[str]):
+    (tmp_path / 'tracker.py').write_text(
+        'import weakref\n'
+        '\n'
+        'class Big:\n'
+        '    pass\n'
+        '\n'
+        'instances = weakref.WeakSet()\n'
+        '\n'
+        'def make():\n'
+        '    big = Big()\n'
+        '    instances.add(big)\n'
+        '    return big\n'
+    )
+    # A function in the namespace refers back to it, forming a cycle:
+    (tmp_path / 'one.rst').write_text(
+        '>>> import tracker\n>>> big = tracker.make()\n>>> def f(): return big\n'
+    )
+    (tmp_path / 'two.rst').write_text(
+        '>>> import tracker\n>>> len(tracker.instances)\n0\n>>> 1 + 1\n3\n'
+    )
+    write_config(tmp_path, PYTEST, pattern="'*.rst'")
+    results = run(capsys, PYTEST, tmp_path)
+    compare((results.total, results.failures), expected=(6, 1), suffix=results.out.text)
+    # Failures are still reported after their document has been released:
+    results.out.assert_present('two.rst:4: SybilFailure')
+
+
+@pytest.mark.parametrize('runner', [PYTEST, UNITTEST])
+def test_precompile_shut_down(tmp_path: Path, capsys: CaptureFixture[str], runner: str):
+    (tmp_path / 'example.rst').write_text('.. code-block:: python\n\n  assert 1 + 1 == 2\n')
+    write_config(
+        tmp_path, runner, parsers='[PythonCodeBlockParser()]', pattern="'*.rst'", precompile='True'
+    )
+    results = run(capsys, runner, tmp_path)
+    compare((results.total, results.failures), expected=(1, 0), suffix=results.out.text)
+    compare(cache._executor, expected=None)
@@ -1,12 +1,39 @@
+import json
+import pickle
 import re
+from copy import copy, deepcopy
+from pathlib import Path
+from typing import Any, Dict
 
 import pytest
 from testfixtures import ShouldRaise, compare
 from testfixtures.comparison import compare_text, compare_dict
 
-from sybil import Lexeme
-from sybil.parsers.abstract.lexers import BlockLexer, LexingException
-from .helpers import lex, sample_path
+from sybil import Document, Lexeme
+from sybil.parsers.abstract.lexers import (
+    BlockLexer,
+    LazyLexeme,
+    Lexemes,
+    LexerCollection,
+    LexingException,
+    ScanningLexer,
+    compile_end_pattern,
+    mapped_lexemes,
+)
+from sybil.parsers.markdown import PythonCodeBlockParser
+from sybil.parsers.markdown.lexers import (
+    FENCE,
+    DirectiveInHTMLCommentLexer,
+    FencedCodeBlockLexer,
+    RawFencedCodeBlockLexer,
+)
+from sybil.parsers.myst.lexers import DirectiveInPercentCommentLexer, DirectiveLexer
+from sybil.parsers.rest.lexers import (
+    END_PATTERN_TEMPLATE,
+    DirectiveInCommentLexer,
+    DirectiveLexer as RestDirectiveLexer,
+)
+from .helpers import lex, region_details, sample_path
 
 
 def test_examples_from_parsing_tests():
@@ -97,3 +124,226 @@ class TestLexemeStripping:
             actual=Lexeme(' \n \n  foo  \n', 10, 1).strip_leading_newlines(),
             expected=Lexeme(' \n \n  foo  \n', 10, 1),
         )
+
+
+class NotScanned(FencedCodeBlockLexer):
+    def __init__(self):
+        super().__init__('python')
+        self.calls = []
+
+    def __call__(self, document: Document):
+        self.calls.append(document.path)
+        return super().__call__(document)
+
+
+def all_lexers():
+    return [
+        FencedCodeBlockLexer(language=r'.+'),
+        DirectiveLexer(directive=r'code-block|sourcecode'),
+        DirectiveLexer(directive=r'eval-rst', arguments=''),
+        DirectiveInPercentCommentLexer(directive=r'(invisible-)?code(-block)?'),
+        DirectiveInHTMLCommentLexer(directive=r'(invisible-)?code(-block)?'),
+        DirectiveInHTMLCommentLexer(directive='skip'),
+        RestDirectiveLexer(directive=r'code-block|sourcecode'),
+        DirectiveInCommentLexer(directive=r'skip'),
+    ]
+
+
+@pytest.mark.parametrize(
+    'name',
+    [
+        'myst-lexers.md',
+        'myst-complicated-nesting.md',
+        'myst-codeblock.md',
+        'myst-skip.md',
+        'markdown-fenced-code-block.md',
+        'lexing-directives.txt',
+        'lexing-nested-directives.txt',
+        'codeblock.txt',
+    ],
+)
+def test_collection_same_as_individual_lexers(name):
+    path = sample_path(name)
+    document = Document(Path(path).read_text(), path)
+    expected = [region for lexer in all_lexers() for region in lexer(document)]
+    collection = LexerCollection(all_lexers())
+    compare(
+        expected=region_details(document, expected),
+        actual=region_details(document, collection(document)),
+    )
+
+
+def test_collection_lexer_overriding_call():
+    not_scanned = NotScanned()
+    collection = LexerCollection([FencedCodeBlockLexer('python'), not_scanned])
+    document = Document('```python\nx\n```\n', 'sample.md')
+    compare([r.lexemes['source'] for r in collection(document)], expected=['x\n', 'x\n'])
+    compare(not_scanned.calls, expected=['sample.md'])
+
+
+def test_collection_changed():
+    collection = LexerCollection([BlockLexer(re.compile('START'), 'END')])
+    document = Document('START a END\nBEGIN b END\n', 'sample.txt')
+    compare([r.lexemes['source'] for r in collection(document)], expected=['a '])
+    collection.append(BlockLexer(re.compile('BEGIN'), 'END'))
+    compare([r.lexemes['source'] for r in collection(document)], expected=['a ', 'b '])
+    collection[0].start_pattern = re.compile('NOTHING')
+    compare([r.lexemes['source'] for r in collection(document)], expected=['b '])
+
+
+def test_scanning_lexer_must_lex_matches():
+    with ShouldRaise(NotImplementedError):
+        ScanningLexer().lex_matches(Document('', 'sample.txt'), [])
+
+
+def test_lexing_shared_between_collections():
+    document = Document('```{code-block} python\n:lineno: 1\n\nx\n```\n', 'sample.md')
+    first = LexerCollection([DirectiveLexer('code-block')])
+    second = LexerCollection([DirectiveLexer('code-block'), FencedCodeBlockLexer('python')])
+    (region,) = first(document)
+    region.lexemes['options']['lineno'] = 'changed'
+    region.lexemes['source'] = 'changed'
+    (shared,) = second(document)
+    assert shared is not region
+    compare(shared.lexemes['options'], expected={'lineno': '1'})
+    compare(shared.lexemes['source'], expected='x\n')
+    compare(
+        sorted(key[0] for key in document.lexed),
+        expected=['matches', 'regions', 'regions'],
+    )
+
+
+def test_lexing_released_after_parsing(tmp_path: Path):
+    path = tmp_path / 'sample.md'
+    path.write_text('```python\nx = 1\n```\n')
+    document = Document.parse(str(path), PythonCodeBlockParser())
+    compare([e.parsed for e in document], expected=['x = 1\n'])
+    compare(document.lexed, expected={})
+
+
+def test_matches_shared_between_collections():
+    document = Document('```python\nx\n```\n', 'sample.md')
+    compare(len(list(LexerCollection([FencedCodeBlockLexer('python')])(document))), expected=1)
+    # Different lexers that use the same start pattern re-use the matches found:
+    document.lexed['matches', FENCE.pattern, FENCE.flags] = []
+    compare(list(LexerCollection([RawFencedCodeBlockLexer()])(document)), expected=[])
+
+
+def test_lexing_key():
+    compare(
+        FencedCodeBlockLexer('python').lexing_key(),
+        expected=FencedCodeBlockLexer('python').lexing_key(),
+    )
+    assert FencedCodeBlockLexer('python').lexing_key() != RawFencedCodeBlockLexer().lexing_key()
+    assert (
+        BlockLexer(re.compile('START'), 'END', {'source': 'x'}).lexing_key()
+        != BlockLexer(re.compile('START'), 'END', {'source': 'y'}).lexing_key()
+    )
+
+
+def test_lexing_not_shared():
+    lexer = BlockLexer(re.compile('START'), 'END')
+    lexer.seen = []  # type: ignore[attr-defined]
+    compare(lexer.lexing_key(), expected=None)
+    document = Document('START a END\n', 'sample.txt')
+    compare([r.lexemes['source'] for r in LexerCollection([lexer])(document)], expected=['a '])
+    compare([key[0] for key in document.lexed], expected=['matches'])
+
+
+def test_lexemes_lazy_until_used():
+    text = '```python\nx = 1\n```\n\n```text\nnot python\n```\n'
+    document = Document(text, 'sample.md')
+    parser = PythonCodeBlockParser()
+    (region,) = parser(document)
+    compare(region.parsed, expected='x = 1\n')
+    (python, other) = next(value for key, value in document.lexed.items() if key[0] == 'regions')
+    compare(type(dict.get(python.lexemes, 'source')), expected=LazyLexeme)
+    # The source of the block that isn't Python is never extracted:
+    source = dict.get(other.lexemes, 'source')
+    assert isinstance(source, LazyLexeme)
+    compare(source.lexeme, expected=None)
+    compare(other.lexemes['source'], expected='not python\n')
+
+
+def test_lexemes_resolved_when_read():
+    def lexemes() -> Lexemes:
+        return Lexemes(
+            language='python', source=LazyLexeme('>  x\n>  y\n', 0, 10, '>', 1, 2, strip=False)
+        )
+
+    expected = {'language': 'python', 'source': 'x\ny\n'}
+    compare(lexemes().get('source'), expected='x\ny\n')
+    compare(lexemes().get('missing'), expected=None)
+    source = lexemes().pop('source')
+    compare(type(source), expected=Lexeme)
+    compare((source.offset, source.line_offset), expected=(1, 2))
+    compare(lexemes().pop('language'), expected='python')
+    compare(dict(lexemes().items()), expected=expected)
+    compare(list(lexemes().values()), expected=['python', 'x\ny\n'])
+    compare(dict(lexemes()), expected=expected)
+    compare({**lexemes()}, expected=expected)
+    assert lexemes() == expected
+    assert not lexemes() != expected
+    compare(repr(lexemes()), expected=repr(expected))
+    unpickled = pickle.loads(pickle.dumps(lexemes()))
+    compare(type(unpickled), expected=Lexemes)
+    compare(type(dict.get(unpickled, 'source')), expected=Lexeme)
+    compare(copy(lexemes()), expected=expected)
+    compare(deepcopy(lexemes()), expected=expected)
+    compare(json.loads(json.dumps(lexemes())), expected=expected)
+    updated: Dict[str, Any] = {}
+    updated.update(lexemes())
+    compare(updated, expected=expected)
+    compare({'x': 1} | lexemes(), expected={'x': 1, **expected})
+    combined = lexemes() | {'x': 1}
+    compare(type(combined), expected=Lexemes)
+    compare(combined, expected={**expected, 'x': 1})
+    with ShouldRaise(TypeError):
+        lexemes() | [('x', 1)]
+    compare(lexemes().setdefault('source'), expected='x\ny\n')
+    compare(lexemes().setdefault('x', 1), expected=1)
+    compare(lexemes().popitem(), expected=('source', 'x\ny\n'))
+
+
+def test_lexemes_copy_stays_lazy():
+    original = Lexemes(source=LazyLexeme('  x\n', 0, 4, '  ', 0, 0))
+    copied = original.copy()
+    compare(type(copied), expected=Lexemes)
+    compare(type(dict.get(copied, 'source')), expected=LazyLexeme)
+    compare(copied['source'], expected='x\n')
+    # The original is unaffected:
+    compare(type(dict.get(original, 'source')), expected=LazyLexeme)
+
+
+def test_lazy_lexeme_strip_leading_newlines():
+    lazy = LazyLexeme('  \n\n  x\n', 0, 8, '  ', 1, 2).strip_leading_newlines()
+    lexeme = lazy.resolve()
+    compare(lexeme, expected='x\n')
+    compare((lexeme.offset, lexeme.line_offset), expected=(3, 4))
+    assert lazy.resolve() is lexeme
+
+
+def test_end_patterns_compiled_once():
+    compile_end_pattern.cache_clear()
+    document = Document('.. code-block:: python\n\n  x\n\n  .. note::\n\n    y\n\n', 'sample.rst')
+    lexers = [RestDirectiveLexer('code-block'), RestDirectiveLexer('note')]
+    for lexer in lexers * 2:
+        list(lexer(document))
+    info = compile_end_pattern.cache_info()
+    compare((info.misses, info.hits), expected=(2, 2))
+    assert compile_end_pattern(END_PATTERN_TEMPLATE, '  ') is compile_end_pattern(
+        END_PATTERN_TEMPLATE, '  '
+    )
+
+
+def test_mapped_lexemes():
+    match = re.match('(?P<prefix> *)(?P<name>[a-z]+)(?P<missing>!)?', '  foo')
+    source = LazyLexeme('  foo\n', 0, 6, '  ', 0, 0)
+    compare(
+        mapped_lexemes(match, source, None, exclude='prefix'),
+        expected={'name': 'foo', 'missing': None, 'source': 'foo\n'},
+    )
+    compare(
+        mapped_lexemes(match, source, {'source': 'body', 'name': 'title'}),
+        expected={'body': 'foo\n', 'title': 'foo'},
+    )
@@ -1,3 +1,12 @@
+from bisect import bisect_left
+from random import Random
+from typing import List, Match, Tuple
+
+import pytest
+from testfixtures import compare
+
+from sybil import Document
+from sybil.parsers.markdown import lexers
 from sybil.parsers.markdown.lexers import RawFencedCodeBlockLexer
 from sybil.region import Region
 from .helpers import check_lexed_regions
@@ -18,3 +27,53 @@ def test_fenced_code_block():
             Region(397, 421, lexemes={'source': 'some stuff here\n~~~\n'}),
         ],
     )
+
+
+class CheckingLexer(RawFencedCodeBlockLexer):
+    @staticmethod
+    def match_closes_existing(current: Match[str], existing: Match[str]) -> bool:
+        return RawFencedCodeBlockLexer.match_closes_existing(current, existing)
+
+
+def lexed(lexer: RawFencedCodeBlockLexer, text: str) -> List[Tuple[int, int, str]]:
+    document = Document(text, 'sample.md')
+    return [(r.start, r.end, r.lexemes['source']) for r in lexer(document)]
+
+
+def test_fence_matching_same_as_checking_each_block():
+    fences = ['```', '````', '~~~', '~~~~', '```info', '  ```', '> ```', '> ~~~~', 'text']
+    randomness = Random(42)
+    for _ in range(200):
+        text = ''.join(f'{randomness.choice(fences)}\n' for _ in range(randomness.randint(0, 12)))
+        compare(
+            lexed(RawFencedCodeBlockLexer(), text),
+            expected=lexed(CheckingLexer(), text),
+            prefix=repr(text),
+        )
+
+
+def test_fence_matching_does_not_check_each_open_block(monkeypatch: pytest.MonkeyPatch):
+    closes_checked: List[Match[str]] = []
+    searched: List[int] = []
+
+    def match_closes_existing(current: Match[str], existing: Match[str]) -> bool:
+        closes_checked.append(current)
+        return False
+
+    def counting_bisect_left(a: List[int], x: int) -> int:
+        searched.append(len(a))
+        return bisect_left(a, x)
+
+    monkeypatch.setattr(
+        RawFencedCodeBlockLexer, 'match_closes_existing', staticmethod(match_closes_existing)
+    )
+    monkeypatch.setattr(lexers, 'bisect_left', counting_bisect_left)
+    blocks = 1000
+    # Fences with info strings open blocks but can never close them, so checking each open
+    # block for every other fence would take time proportional to the square of the blocks:
+    text = '```python\nx\n' * blocks + '~~~\n' * blocks
+    compare(len(lexed(RawFencedCodeBlockLexer(), text)), expected=blocks // 2)
+    compare(closes_checked, expected=[])
+    # Only the open blocks with the same fence character are searched, and only once for
+    # each fence that could close one of them:
+    compare(searched, expected=[1] * (blocks // 2))
@@ -0,0 +1,149 @@
+from pathlib import Path, PurePosixPath
+
+import pytest
+from testfixtures import ShouldRaise, compare
+
+from sybil.paths import PathMatcher, translate_pattern, walk_files
+
+PATTERNS = [
+    '*.rst',
+    '**/*.rst',
+    'docs/*.rst',
+    '*/child/*',
+    'foo.rst',
+    'b?r.rst',
+    '[bf]*.rst',
+    '[!b]*.rst',
+    '[a-c]ar.rst',
+    '[z-a]*',
+    '[!z-a]*',
+    '[]]x',
+    '[!]x',
+    '[x',
+    '**',
+    '***.py',
+    'a.b+c(d).txt',
+    './parent/*.rst',
+    'parent/',
+    '/parent/*.rst',
+]
+
+PATHS = [
+    'foo.rst',
+    'bar.rst',
+    'bar.py',
+    'parent/foo.rst',
+    'parent/child/bar.rst',
+    'parent/child/x',
+    'docs/car.rst',
+    'docs/sub/car.rst',
+    'docs/[x',
+    ']x',
+    '[!]x',
+    'x',
+    'a.b+c(d).txt',
+    'aXb+c(d).txt',
+    'parent',
+]
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_same_as_path_match(pattern):
+    matcher = PathMatcher([pattern])
+    compare(
+        expected=[path for path in PATHS if PurePosixPath(path).match(pattern)],
+        actual=[path for path in PATHS if matcher(path)],
+    )
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_directories_same_as_path_match(pattern):
+    matcher = PathMatcher([pattern], directories=True)
+
+    def match(path: PurePosixPath) -> bool:
+        return any(p.match(pattern) for p in (path, *path.parents) if p.parts)
+
+    compare(
+        expected=[path for path in PATHS if match(PurePosixPath(path))],
+        actual=[path for path in PATHS if matcher(path)],
+    )
+
+
+def test_directories():
+    matcher = PathMatcher(['child', 'docs/*.rst'], directories=True)
+    compare(
+        [path for path in PATHS if matcher(path)],
+        expected=['parent/child/bar.rst', 'parent/child/x', 'docs/car.rst'],
+    )
+
+
+def test_multiple_patterns():
+    matcher = PathMatcher(['*.py', 'docs/*.rst'])
+    compare([path for path in PATHS if matcher(path)], expected=['bar.py', 'docs/car.rst'])
+
+
+def test_no_patterns():
+    assert not PathMatcher([])('foo.rst')
+
+
+def test_only_absolute_patterns():
+    assert not PathMatcher(['/foo.rst'])('foo.rst')
+    compare(translate_pattern('/foo.rst'), expected=None)
+
+
+def test_empty_pattern():
+    with ShouldRaise(ValueError('empty pattern')):
+        PathMatcher([''])
+
+
+def glob_files(directory: Path):
+    return [path for path in sorted(directory.glob('**/*')) if path.is_file()]
+
+
+def test_walk_files_same_as_glob(tmp_path: Path):
+    for name in 'a.rst', 'a/x.rst', 'a/b/y.rst', 'a0', 'B.txt', '.hidden/z.rst', 'c/d/e/f':
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    (tmp_path / 'empty').mkdir()
+    # Symbolic links to files are included, but those to directories are not followed:
+    (tmp_path / 'link.rst').symlink_to(tmp_path / 'a.rst')
+    (tmp_path / 'c' / 'loop').symlink_to(tmp_path)
+    (tmp_path / 'broken.rst').symlink_to(tmp_path / 'missing.rst')
+    compare(list(walk_files(tmp_path)), expected=glob_files(tmp_path))
+    compare(
+        [str(path.relative_to(tmp_path)) for path in walk_files(tmp_path)],
+        expected=[
+            '.hidden/z.rst',
+            'B.txt',
+            'a/b/y.rst',
+            'a/x.rst',
+            'a.rst',
+            'a0',
+            'c/d/e/f',
+            'link.rst',
+        ],
+    )
+
+
+def test_walk_files_missing_directory(tmp_path: Path):
+    compare(list(walk_files(tmp_path / 'missing')), expected=[])
+
+
+def test_walk_files_skip(tmp_path: Path):
+    for name in 'a.rst', 'a/x.rst', 'a/b/y.rst', 'c/z.rst':
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    searched = []
+
+    def skip(path: Path) -> bool:
+        searched.append(path.relative_to(tmp_path).as_posix())
+        return path.name == 'a'
+
+    compare(
+        [path.relative_to(tmp_path).as_posix() for path in walk_files(tmp_path, skip)],
+        expected=['a.rst', 'c/z.rst'],
+    )
+    # Nothing within a skipped directory is looked at:
+    compare(searched, expected=['a', 'c'])
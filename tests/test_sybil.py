@@ -2,6 +2,7 @@ from __future__ import print_function
 
 import re
 from functools import partial
+from random import Random
 from os.path import split
 from pathlib import Path
 
@@ -221,6 +222,49 @@ class TestDocument:
             'from line 1, column 3 to line 1, column 5'
         )
 
+    def test_add_all(self, document):
+        region1 = Region(0, 1, None, None)
+        region2 = Region(2, 3, None, None)
+        region3 = Region(4, 6, None, None)
+        document.add(region2)
+        document.add_all([region3, region1])
+        assert [e.region for e in document] == [region1, region2, region3]
+
+    def test_add_all_overlaps(self, document):
+        document.add(Region(0, 2, None, None))
+        with pytest.raises(ValueError) as excinfo:
+            document.add_all([Region(4, 5, None, None), Region(1, 3, None, None)])
+        assert str(excinfo.value) == (
+            '<Region start=0 end=2>'
+            ' from line 1, column 1 to line 1, column 3 overlaps '
+            '<Region start=1 end=3>'
+            ' from line 1, column 2 to line 1, column 4'
+        )
+
+    def test_add_all_same_as_add(self):
+        random = Random(42)
+
+        existing = Region(5, 5, None, None)
+
+        def outcome(add, regions):
+            document = Document('ABCDEFGHIJ', '/the/path')
+            document.add(existing)
+            try:
+                add(document, regions)
+            except ValueError as e:
+                return str(e)
+            return [(e.region.start, e.region.end, id(e.region)) for e in document]
+
+        for _ in range(500):
+            regions = []
+            for _ in range(random.randint(0, 6)):
+                start = random.randint(-1, 10)
+                regions.append(Region(start, start + random.randint(0, 2), None, None))
+            compare(
+                expected=outcome(lambda d, r: [d.add(region) for region in r], regions),
+                actual=outcome(Document.add_all, regions),
+            )
+
     def test_example_path(self, document):
         document.add(Region(0, 1, None, None))
         assert [e.document for e in document] == [document]
@@ -340,6 +384,34 @@ class TestSybil:
         sybil = Sybil([parse_for_x], name='foo')
         compare(repr(sybil), expected='<Sybil: foo>')
 
+    def test_should_parse(self, tmp_path: Path):
+        sybil = Sybil(
+            [], path=str(tmp_path / 'docs'), patterns=['*.rst'], filenames=['README'], exclude='x*'
+        )
+        assert sybil.should_parse(tmp_path / 'docs' / 'a.rst')
+        assert sybil.should_parse(tmp_path / 'docs' / 'sub' / 'README')
+        assert not sybil.should_parse(tmp_path / 'docs' / 'sub' / 'xa.rst')
+        assert not sybil.should_parse(tmp_path / 'docs' / 'a.txt')
+        assert not sybil.should_parse(tmp_path / 'docs')
+        assert not sybil.should_parse(tmp_path / 'docs.rst')
+        assert not sybil.should_parse(tmp_path / 'docsx' / 'a.rst')
+        assert not sybil.should_parse(tmp_path / 'a.rst')
+
+    def test_should_parse_excluded_directory(self, tmp_path: Path):
+        sybil = Sybil([], path=str(tmp_path), pattern='*.rst', excludes=['build', '.*'])
+        assert sybil.should_parse(tmp_path / 'docs' / 'a.rst')
+        assert sybil.should_parse(tmp_path / 'docs' / 'building.rst')
+        assert not sybil.should_parse(tmp_path / 'build' / 'a.rst')
+        assert not sybil.should_parse(tmp_path / 'docs' / 'build' / 'sub' / 'a.rst')
+        assert not sybil.should_parse(tmp_path / '.venv' / 'lib' / 'a.rst')
+
+    def test_should_search(self, tmp_path: Path):
+        sybil = Sybil([], path=str(tmp_path / 'docs'), excludes=['build'])
+        assert sybil.should_search(tmp_path / 'docs' / 'sub')
+        assert not sybil.should_search(tmp_path / 'docs' / 'build')
+        assert not sybil.should_search(tmp_path / 'docs' / 'sub' / 'build')
+        assert sybil.should_search(tmp_path / 'docs')
+
 
 def check_into_namespace(example):
     parsed, namespace = example.region.parsed, example.namespace